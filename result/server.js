@@ -46,6 +46,9 @@ io.on('connection', function (socket) {
   });
 });
 
+// Last scores emitted to clients, patched by vote updates
+var latestCompetitions = [];
+
 var pool = new Pool({
   connectionString: connectionString
 });
@@ -73,8 +76,12 @@ async.retry(
     redisSubscriber.subscribe('vote_updates');
     redisSubscriber.on('message', function(channel, message) {
       if (channel === 'vote_updates') {
-        console.log('Vote update received, refreshing scores...');
-        getVotes(client);
+        if (applyVoteUpdate(message)) {
+          io.sockets.emit("scores", JSON.stringify(latestCompetitions));
+        } else {
+          console.log('Vote update received, refreshing scores...');
+          getVotes(client);
+        }
       }
     });
   }
@@ -100,14 +107,37 @@ function getVotes(client) {
     if (err) {
       console.error("Error performing query: " + err);
     } else {
-      var competitions = formatCompetitions(result);
-      io.sockets.emit("scores", JSON.stringify(competitions));
+      latestCompetitions = formatCompetitions(result);
+      io.sockets.emit("scores", JSON.stringify(latestCompetitions));
     }
     
     // No more setTimeout - only updates on Redis pub/sub events
   });
 }
 
+// Vote updates carry the competition's new counts; patch the last snapshot
+// in place instead of re-querying. Returns false when a full reload is needed.
+function applyVoteUpdate(message) {
+  var update;
+  try {
+    update = JSON.parse(message);
+  } catch (err) {
+    return false;
+  }
+  if (update.votes_a === undefined || update.votes_b === undefined) {
+    return false;
+  }
+  var competition = latestCompetitions.find(function (c) {
+    return c.id === update.competition_id;
+  });
+  if (!competition) {
+    return false;
+  }
+  competition.a = update.votes_a;
+  competition.b = update.votes_b;
+  return true;
+}
+
 function formatCompetitions(result) {
   var competitions = [];
 
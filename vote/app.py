@@ -1,5 +1,4 @@
 from flask import Flask, render_template, request, make_response, g, jsonify, redirect, url_for
-from redis import Redis
 import os
 import socket
 import random
@@ -7,17 +6,33 @@ import json
 import logging
 from datetime import datetime
 import psycopg2
+from redis.exceptions import RedisError
 from psycopg2.extras import RealDictCursor
-from auth import hash_password, verify_password, create_jwt_token, verify_jwt_token, login_required, admin_required, get_current_user, get_auth_token_from_request, AuthError
+from db_pool import ConnectionPool
+from redis_client import get_redis_client
+from tallies import attach_tallies, load_vote_counts, load_user_overlay
+from response_cache import ResponseCache
+from view_counts import ViewFlusher, record_view
+from json_provider import make_provider
+from records import COMPETITION_LISTING_COLUMNS, CompetitionListingRecord, fetch_records
+from comments import COMMENTS_PAGE_SIZE, load_threads, load_replies, comment_ids, mark_liked
+from live_updates import (LiveUpdates, competition_channel, parse_competition_ids, connected_frame,
+                          heartbeat_frame, data_frames, SSE_HEARTBEAT_SECONDS)
+import scoreboard
+import trending
+import vote_transport
+import user_overlay
+import redis_scripts
+import http_cache
+import metrics
+from search import build_search
+from pagination import SortKey, InvalidCursor, apply_keyset, paginate, parse_page_size
+from auth import hash_password, verify_password, needs_rehash, create_jwt_token, login_required, admin_required, get_current_user, token_cache, PasswordHashingBusy
 
 option_a = os.getenv('OPTION_A', "Cats")
 option_b = os.getenv('OPTION_B', "Dogs")
 hostname = socket.gethostname()
 
-# Redis Configuration from environment
-redis_host = os.getenv('REDIS_HOST', 'redis')
-redis_port = int(os.getenv('REDIS_PORT', 6379))
-
 # Database Configuration from environment
 db_host = os.getenv('DB_HOST', 'db')
 db_port = int(os.getenv('DB_PORT', 5432))
@@ -28,32 +43,222 @@ db_connection_string = f"dbname={db_name} user={db_user} password={db_password}
 
 app = Flask(__name__)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key-change-in-production')
+app.json = make_provider(app)
 
 gunicorn_error_logger = logging.getLogger('gunicorn.error')
 app.logger.handlers.extend(gunicorn_error_logger.handlers)
 app.logger.setLevel(logging.INFO)
 
 def get_redis():
-    if not hasattr(g, 'redis'):
-        g.redis = Redis(host=redis_host, port=redis_port, db=0, socket_timeout=5)
-    return g.redis
+    """Get the process-wide pooled Redis client"""
+    return get_redis_client()
+
+db_pool = ConnectionPool(db_connection_string, connection_factory=metrics.InstrumentedConnection)
+competitions_cache = ResponseCache('api_competitions')
+# Rendered comment thread pages, invalidated per competition
+comments_cache = ResponseCache('comments')
+VOTE_UPDATES_CHANNEL = 'vote_updates'
+live_updates = LiveUpdates(VOTE_UPDATES_CHANNEL)
+view_flusher = ViewFlusher(get_redis, db_pool)
+request_metrics = metrics.Metrics(get_redis)
+request_metrics.add_collector(lambda: metrics.pool_samples(db_pool))
+request_metrics.add_collector(lambda: metrics.sse_samples(live_updates))
+
+# When set, pages open their SSE streams on the stream gateway at this base URL
+# instead of on the Flask endpoints below
+VOTE_STREAM_URL = os.getenv('VOTE_STREAM_URL', '').rstrip('/')
+
+LISTING_SORTS = ('newest', 'popular', 'trending', 'ending_soon', 'relevance')
+ADMIN_SEARCH_PAGE_SIZE = 50
+
+FAVORITE_SORT_KEYS = [SortKey('uf.created_at', 'favorited_at', True, 'timestamp'),
+                      SortKey('c.id', 'id', True, 'integer')]
+TRASH_SORT_KEYS = [SortKey('deleted_at', 'deleted_at', True, 'timestamp'),
+                   SortKey('id', 'id', True, 'integer')]
+ARCHIVE_SORT_KEYS = [SortKey("COALESCE(archived_at, '-infinity'::timestamp)", 'archived_at', True,
+                             'timestamp', '-infinity'),
+                     SortKey('id', 'id', True, 'integer')]
+
+# Keyset sort orders for competition listings; every order ends in c.id so
+# cursors are unambiguous
+_CREATED_DESC = SortKey('c.created_at', 'created_at', True, 'timestamp')
+_ID_DESC = SortKey('c.id', 'id', True, 'integer')
+COMPETITION_SORT_KEYS = {
+    'newest': [_CREATED_DESC, _ID_DESC],
+    'popular': [SortKey('COALESCE(c.participant_count, 0)', 'participant_count', True, 'integer', 0),
+                _CREATED_DESC, _ID_DESC],
+    'trending': [SortKey('COALESCE(c.trending_score, 0)', 'trending_score', True, 'integer', 0),
+                 _CREATED_DESC, _ID_DESC],
+    'ending_soon': [SortKey("COALESCE(c.scheduled_end, 'infinity'::timestamp)", 'scheduled_end', False,
+                            'timestamp', 'infinity'),
+                    _CREATED_DESC, _ID_DESC],
+}
+TRENDING_LIMIT = 10
+HASHING_BUSY_MESSAGE = 'Too many sign-ins right now. Please try again in a moment.'
 
 def get_db():
-    """Get database connection"""
+    """Check out a pooled database connection for the current app context"""
     if not hasattr(g, 'db'):
         try:
-            g.db = psycopg2.connect(db_connection_string)
+            g.db = db_pool.getconn()
         except psycopg2.Error as e:
             app.logger.error(f"Database connection failed: {e}")
             raise
     return g.db
 
+def get_live_scores(cursor, competition_id):
+    """Get (counts, source) from the Redis scoreboard, falling back to Postgres"""
+    try:
+        return scoreboard.get_or_seed_scores(get_redis(), cursor, competition_id)
+    except RedisError as e:
+        app.logger.warning(f"Live scoreboard unavailable: {e}")
+        return load_vote_counts(cursor, [competition_id])[competition_id], 'db'
+
+def invalidate_listing_caches():
+    """Drop cached listings after a competition was created or changed"""
+    competitions_cache.invalidate(get_redis())
+
+def parse_listing_sort(search):
+    """Validated sort order; relevance is the default (and only valid) with a search term"""
+    sort_by = request.args.get('sort') or ('relevance' if search else 'newest')
+    if sort_by not in LISTING_SORTS or (sort_by == 'relevance' and not search):
+        sort_by = 'newest'
+    return sort_by
+
+def listing_filter(where, search, tag_filter):
+    """Add search and tag conditions; returns (where, params, search_filter)"""
+    params = []
+    search_filter = build_search(search, alias='c') if search else None
+    if search_filter:
+        where += f" AND {search_filter.where}"
+        params.extend(search_filter.where_params)
+    
+    if tag_filter:
+        where += " AND %s = ANY(c.tags)"
+        params.append(tag_filter)
+    return where, params, search_filter
+
+def fetch_competition_page(cursor, columns, where, params, sort_by, page_cursor, limit, search_filter=None,
+                           record_class=None):
+    """Run a keyset-paginated competitions query; returns (rows, next_cursor)
+
+    ``columns`` and ``where`` refer to the competitions table as ``c``;
+    ``search_filter`` supplies the rank for the relevance sort. With a
+    ``record_class``, ``cursor`` must be a plain cursor and rows come back as
+    records of that class. Raises InvalidCursor for a cursor from another
+    sort order.
+    """
+    select_params = []
+    expr_params = None
+    if sort_by == 'relevance':
+        # Select the rank so the next-page cursor can carry it
+        keys = [SortKey(search_filter.rank, 'search_rank', True, 'float8'), _CREATED_DESC, _ID_DESC]
+        columns += f", {search_filter.rank} AS search_rank"
+        select_params = list(search_filter.rank_params)
+        expr_params = {'search_rank': search_filter.rank_params}
+    else:
+        keys = COMPETITION_SORT_KEYS[sort_by]
+    
+    sql, params = apply_keyset(f"SELECT {columns} FROM competitions c WHERE {where}",
+                               select_params + list(params), keys, sort_by, page_cursor, limit, expr_params)
+    cursor.execute(sql, params)
+    rows = fetch_records(cursor, record_class) if record_class else cursor.fetchall()
+    return paginate(rows, limit, sort_by, keys)
+
+def refresh_trending(db):
+    """Roll the Redis trending window (persisting scores when due); returns
+    False when Redis is unavailable"""
+    try:
+        trending.ensure_fresh(get_redis(), db)
+        return True
+    except RedisError as e:
+        app.logger.warning(f"Trending window unavailable, using stored scores: {e}")
+        return False
+
+def load_trending(db, cursor, columns, limit):
+    """Top ``limit`` active competitions by the Redis trending window, or by
+    the stored scores when Redis is unavailable"""
+    ranked = None
+    if refresh_trending(db):
+        try:
+            # Over-fetch so inactive competitions can be filtered out below
+            ranked = trending.top_competition_ids(get_redis(), limit * 3)
+        except RedisError as e:
+            app.logger.warning(f"Trending window unavailable, using stored scores: {e}")
+    
+    if ranked is None:
+        cursor.execute(f"""
+            SELECT {columns}
+            FROM competitions
+            WHERE deleted_at IS NULL AND is_archived = FALSE 
+            AND status = 'active' AND trending_score > 0
+            ORDER BY trending_score DESC
+            LIMIT %s
+        """, (limit,))
+        return cursor.fetchall()
+    
+    scores = {comp_id: score for comp_id, score in ranked if score > 0}
+    cursor.execute(f"""
+        SELECT {columns}
+        FROM competitions
+        WHERE id = ANY(%s) AND deleted_at IS NULL AND is_archived = FALSE 
+        AND status = 'active'
+    """, (list(scores),))
+    result = cursor.fetchall()
+    for comp in result:
+        comp['trending_score'] = scores[comp['id']]
+    result.sort(key=lambda comp: comp['trending_score'], reverse=True)
+    return result[:limit]
+
+def paged_json(rows, next_cursor):
+    """JSON list response with the next-page cursor in the X-Next-Cursor header"""
+    resp = jsonify(rows)
+    if next_cursor:
+        resp.headers['X-Next-Cursor'] = next_cursor
+    return resp
+
+def comment_page_response(cursor, body, user_id):
+    """Overlay the user's likes on a rendered comment page and respond"""
+    payload = json.loads(body)
+    comments = payload['comments']
+    ids = comment_ids(comments)
+    liked_ids = set()
+    if ids:
+        cursor.execute("""
+            SELECT comment_id 
+            FROM comment_likes 
+            WHERE user_id = %s AND comment_id = ANY(%s)
+        """, (user_id, ids))
+        liked_ids = {row['comment_id'] for row in cursor.fetchall()}
+    mark_liked(comments, liked_ids)
+    cursor.close()
+    return paged_json(comments, payload['next_cursor'])
+
+@app.errorhandler(InvalidCursor)
+def invalid_cursor(error):
+    """Reject malformed or mismatched pagination cursors"""
+    return jsonify({'error': f'Invalid cursor: {error}'}), 400
+
+@app.before_request
+def start_request_metrics():
+    request_metrics.start_request()
+
+@app.after_request
+def finalize_response(response):
+    """Answer unchanged JSON GETs with 304, compress what is sent and record
+    the request's metrics"""
+    response = http_cache.add_etag(request, response)
+    response = http_cache.compress(request, response)
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    request_metrics.finish_request(route, request.method, response.status_code)
+    return response
+
 @app.teardown_appcontext
 def close_db(error):
-    """Close database connection"""
+    """Return the database connection to the pool"""
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        db_pool.putconn(db, close=isinstance(error, psycopg2.OperationalError))
 
 @app.route("/register", methods=['GET', 'POST'])
 def register():
@@ -103,6 +308,9 @@ def register():
             resp.set_cookie('auth_token', token, httponly=True, max_age=86400)
             return resp
         
+        except PasswordHashingBusy:
+            return render_template('register.html', error=HASHING_BUSY_MESSAGE), 503, {'Retry-After': '1'}
+        
         except Exception as e:
             app.logger.error(f"Registration error: {e}")
             return render_template('register.html', error='Registration failed. Please try again.')
@@ -136,6 +344,30 @@ def login():
             if login_role == 'admin' and not user['is_admin']:
                 return render_template('login.html', error='Admin access required. This account is not an admin.')
             
+            # Upgrade legacy or outdated hashes while we have the plaintext;
+            # not worth failing the login over, so it is retried on the next one
+            if needs_rehash(user['password_hash']):
+                cursor = db.cursor()
+                try:
+                    cursor.execute("UPDATE users SET password_hash = %s WHERE id = %s",
+                                   (hash_password(password), user['id']))
+                    db.commit()
+                except PasswordHashingBusy:
+                    pass
+                except psycopg2.Error as e:
+                    db.rollback()
+                    app.logger.warning(f"Password rehash failed for user {user['id']}: {e}")
+                finally:
+                    cursor.close()
+            
+            # Warm the favorites/votes overlay the listing pages read
+            try:
+                cursor = db.cursor(cursor_factory=RealDictCursor)
+                user_overlay.warm(get_redis(), cursor, user['id'])
+                cursor.close()
+            except RedisError as e:
+                app.logger.warning(f"User overlay warm-up failed: {e}")
+            
             # Create token and redirect based on role
             token = create_jwt_token(user['id'], user['username'], user['is_admin'])
             
@@ -148,6 +380,9 @@ def login():
             resp.set_cookie('auth_token', token, httponly=True, max_age=86400)
             return resp
         
+        except PasswordHashingBusy:
+            return render_template('login.html', error=HASHING_BUSY_MESSAGE), 503, {'Retry-After': '1'}
+        
         except Exception as e:
             app.logger.error(f"Login error: {e}")
             return render_template('login.html', error='Login failed. Please try again.')
@@ -175,68 +410,26 @@ def competitions():
         # Get filter parameters
         search = request.args.get('search', '').strip()
         tag_filter = request.args.get('tag', '').strip()
-        sort_by = request.args.get('sort', 'newest')  # newest, popular, ending_soon
-        
-        # Build query with filters
-        sql = """
-            SELECT c.id, c.name, c.description, c.option_a, c.option_b, c.status, 
-                   c.created_at, c.tags, c.image_url, c.trending_score, c.view_count, 
-                   c.participant_count, c.scheduled_end
-            FROM competitions c
-            WHERE c.deleted_at IS NULL AND c.is_archived = FALSE
-        """
-        params = []
-        
-        if search:
-            sql += " AND (c.name ILIKE %s OR c.description ILIKE %s)"
-            params.extend([f'%{search}%', f'%{search}%'])
-        
-        if tag_filter:
-            sql += " AND %s = ANY(c.tags)"
-            params.append(tag_filter)
-        
-        # Sorting
-        if sort_by == 'popular':
-            sql += " ORDER BY c.participant_count DESC, c.created_at DESC"
-        elif sort_by == 'ending_soon':
-            sql += " ORDER BY c.scheduled_end ASC NULLS LAST, c.created_at DESC"
-        elif sort_by == 'trending':
-            sql += " ORDER BY c.trending_score DESC, c.created_at DESC"
-        else:  # newest
-            sql += " ORDER BY c.created_at DESC"
-        
-        cursor.execute(sql, params)
-        comps = cursor.fetchall()
-        
-        # Get vote counts and user favorites for each competition
-        for comp in comps:
-            # Vote counts
-            cursor.execute("""
-                SELECT vote, COUNT(*) as count 
-                FROM votes 
-                WHERE competition_id = %s 
-                GROUP BY vote
-            """, (comp['id'],))
-            votes = {row['vote']: row['count'] for row in cursor.fetchall()}
-            comp['votes_a'] = votes.get('a', 0)
-            comp['votes_b'] = votes.get('b', 0)
-            comp['total_votes'] = comp['votes_a'] + comp['votes_b']
-            
-            # Check if user favorited
-            cursor.execute("""
-                SELECT id FROM user_favorites 
-                WHERE user_id = %s AND competition_id = %s
-            """, (current_user['user_id'], comp['id']))
-            comp['is_favorited'] = cursor.fetchone() is not None
-            
-            # Check if user already voted
-            cursor.execute("""
-                SELECT vote FROM votes 
-                WHERE competition_id = %s AND user_id = %s
-                ORDER BY created_at DESC LIMIT 1
-            """, (comp['id'], current_user['user_id']))
-            vote_result = cursor.fetchone()
-            comp['user_vote'] = vote_result['vote'] if vote_result else None
+        # newest, popular, trending, ending_soon, relevance (default when searching)
+        sort_by = parse_listing_sort(search)
+        if sort_by == 'trending':
+            # The listing orders by the stored scores
+            refresh_trending(db)
+        
+        # Fetch one page with filters
+        where, params, search_filter = listing_filter(
+            "c.deleted_at IS NULL AND c.is_archived = FALSE", search, tag_filter)
+        comps, next_cursor = fetch_competition_page(
+            cursor,
+            """c.id, c.name, c.description, c.option_a, c.option_b, c.status, 
+               c.created_at, c.tags, c.image_url, c.trending_score, c.view_count, 
+               c.participant_count, c.scheduled_end""",
+            where, params, sort_by,
+            request.args.get('cursor'), parse_page_size(request.args.get('limit')),
+            search_filter=search_filter)
+        
+        # Get vote counts, user favorites and the user's own votes in bulk
+        attach_tallies(cursor, comps, user_id=current_user['user_id'], user_votes=True, redis=get_redis())
         
         # Get all unique tags for filter dropdown
         cursor.execute("""
@@ -248,14 +441,7 @@ def competitions():
         all_tags = [row['tag'] for row in cursor.fetchall()]
         
         # Get trending competitions (top 5)
-        cursor.execute("""
-            SELECT id, name, trending_score 
-            FROM competitions 
-            WHERE deleted_at IS NULL AND is_archived = FALSE AND trending_score > 0
-            ORDER BY trending_score DESC 
-            LIMIT 5
-        """)
-        trending = cursor.fetchall()
+        top_trending = load_trending(db, cursor, "id, name, trending_score", 5)
         
         cursor.close()
         
@@ -263,10 +449,15 @@ def competitions():
                              competitions=comps, 
                              user=current_user,
                              all_tags=all_tags,
-                             trending=trending,
+                             trending=top_trending,
                              search=search,
                              tag_filter=tag_filter,
-                             sort_by=sort_by)
+                             sort_by=sort_by,
+                             next_cursor=next_cursor,
+                             vote_stream_url=VOTE_STREAM_URL)
+    
+    except InvalidCursor:
+        return redirect(url_for('competitions', search=search, tag=tag_filter, sort=sort_by))
     
     except Exception as e:
         app.logger.error(f"Error loading competitions: {e}")
@@ -275,6 +466,7 @@ def competitions():
                              user=current_user,
                              all_tags=[],
                              trending=[],
+                             vote_stream_url=VOTE_STREAM_URL,
                              error='Failed to load competitions')
 
 
@@ -304,6 +496,7 @@ def vote(competition_id):
         
         current_user = get_current_user()
         vote = None
+        tally = None
         
         if request.method == 'POST':
             vote_choice = request.form.get('vote', '').strip()
@@ -321,29 +514,35 @@ def vote(competition_id):
                 'competition_id': competition_id,
                 'user_id': current_user['user_id']
             })
+            # Enqueue for the worker and broadcast the real-time update in
+            # a single round trip; the scoreboard script publishes the new
+            # counts to the aggregate and per-competition channels
+            timestamp = str(datetime.now())
+            channels = [VOTE_UPDATES_CHANNEL, competition_channel(VOTE_UPDATES_CHANNEL, competition_id)]
             redis = get_redis()
-            redis.rpush('votes', data)
-            
-            # Broadcast vote event for real-time updates
-            redis.publish('vote_updates', json.dumps({
-                'competition_id': competition_id,
-                'timestamp': str(datetime.now())
-            }))
+            pipe = redis.pipeline(transaction=False)
+            vote_transport.enqueue(pipe, data)
+            scoreboard.record_vote(redis, pipe, competition_id, current_user['user_id'], vote_choice,
+                                   channels, timestamp)
+            competitions_cache.invalidate_throttled(redis, pipe)
+            user_overlay.set_vote(redis, current_user['user_id'], competition_id, vote_choice, pipe=pipe)
+            results = redis_scripts.execute(redis, pipe)
+            request_metrics.inc('vote_votes_enqueued_total', (('vote', vote_choice),))
+            tally, _ = scoreboard.parse_record_result(results[1])
+            if tally is None:
+                # The board was cold, so the vote was neither counted nor
+                # published; seed it and count the vote on it
+                tally = scoreboard.seed_and_record(redis, cursor, competition_id, current_user['user_id'],
+                                                   vote_choice, channels, timestamp)
             
             app.logger.info(f'User {current_user["username"]} voted for {vote_choice} in competition {competition_id}')
             vote = vote_choice
         
-        # Get current vote counts
-        cursor.execute("""
-            SELECT vote, COUNT(*) as count 
-            FROM votes 
-            WHERE competition_id = %s 
-            GROUP BY vote
-        """, (competition_id,))
-        votes_result = cursor.fetchall()
-        votes_dict = {row['vote']: row['count'] for row in votes_result}
-        comp['votes_a'] = votes_dict.get('a', 0)
-        comp['votes_b'] = votes_dict.get('b', 0)
+        # Get current vote counts from the live scoreboard
+        if tally is None:
+            tally, _ = get_live_scores(cursor, competition_id)
+        comp['votes_a'] = tally['a']
+        comp['votes_b'] = tally['b']
         
         cursor.close()
         
@@ -356,112 +555,100 @@ def vote(competition_id):
 
 @app.route("/api/competitions", methods=['GET'])
 def api_competitions():
-    """API endpoint for competitions list with enhanced fields"""
+    """API endpoint for competitions list with enhanced fields
+
+    The shared part of the response is cached per normalized query; the
+    caller's favorite flags are overlaid afterwards.
+    """
     try:
-        db = get_db()
-        cursor = db.cursor(cursor_factory=RealDictCursor)
-        
         # Get search and filter parameters
-        search = request.args.get('search', '')
-        tag_filter = request.args.get('tag', '')
-        sort_by = request.args.get('sort', 'newest')
-        
-        # Build query with filters
-        sql = """
-            SELECT id, name, description, option_a, option_b, tags, image_url,
-                   status, created_at, updated_at, is_archived, trending_score,
-                   view_count, participant_count
-            FROM competitions 
-            WHERE deleted_at IS NULL AND is_archived = FALSE AND status = 'active'
-        """
-        params = []
-        
-        # Search filter
-        if search:
-            sql += " AND (name ILIKE %s OR description ILIKE %s)"
-            params.extend([f'%{search}%', f'%{search}%'])
-        
-        # Tag filter
-        if tag_filter:
-            sql += " AND %s = ANY(tags)"
-            params.append(tag_filter)
-        
-        # Sorting
-        if sort_by == 'popular':
-            sql += " ORDER BY participant_count DESC, created_at DESC"
-        elif sort_by == 'ending_soon':
-            sql += " ORDER BY scheduled_end ASC NULLS LAST, created_at DESC"
-        elif sort_by == 'trending':
-            sql += " ORDER BY trending_score DESC, created_at DESC"
-        else:  # newest
-            sql += " ORDER BY created_at DESC"
-        
-        cursor.execute(sql, params)
-        comps = cursor.fetchall()
+        search = request.args.get('search', '').strip()
+        tag_filter = request.args.get('tag', '').strip()
+        sort_by = parse_listing_sort(search)
+        page_cursor = request.args.get('cursor') or None
+        limit = parse_page_size(request.args.get('limit'))
+        
+        # Full-text, ILIKE and trigram matching are all case-insensitive, so
+        # the lowercased term is an equivalent cache key
+        cache_params = {'search': search.lower(), 'tag': tag_filter, 'sort': sort_by,
+                        'cursor': page_cursor, 'limit': limit}
+        generation, body = competitions_cache.get(get_redis(), cache_params)
+        
+        db = None
+        if body is None:
+            db = get_db()
+            body = render_competitions_listing(db, search, tag_filter, sort_by, page_cursor, limit)
+            competitions_cache.set(get_redis(), generation, cache_params, body)
         
-        for comp in comps:
-            cursor.execute("""
-                SELECT vote, COUNT(*) as count 
-                FROM votes 
-                WHERE competition_id = %s 
-                GROUP BY vote
-            """, (comp['id'],))
-            votes = {row['vote']: row['count'] for row in cursor.fetchall()}
-            comp['votes_a'] = votes.get('a', 0)
-            comp['votes_b'] = votes.get('b', 0)
-            comp['total_votes'] = comp['votes_a'] + comp['votes_b']
-            
-            # Add vote percentages
-            if comp['total_votes'] > 0:
-                comp['percentage_a'] = round((comp['votes_a'] / comp['total_votes']) * 100, 1)
-                comp['percentage_b'] = round((comp['votes_b'] / comp['total_votes']) * 100, 1)
-            else:
-                comp['percentage_a'] = 0
-                comp['percentage_b'] = 0
-            
-            # Check if favorited (if user is logged in)
-            comp['is_favorited'] = False
-            try:
-                current_user = get_current_user()
-                cursor.execute("""
-                    SELECT id FROM user_favorites 
-                    WHERE user_id = %s AND competition_id = %s
-                """, (current_user['user_id'], comp['id']))
-                comp['is_favorited'] = cursor.fetchone() is not None
-            except:
-                pass
-        
-        # Get all unique tags
-        cursor.execute("""
-            SELECT DISTINCT unnest(tags) as tag 
-            FROM competitions 
-            WHERE deleted_at IS NULL AND is_archived = FALSE 
-                AND tags IS NOT NULL AND array_length(tags, 1) > 0
-            ORDER BY tag
-        """)
-        all_tags = [row['tag'] for row in cursor.fetchall()]
+        current_user = get_current_user()
+        if current_user is None:
+            return app.response_class(body, mimetype='application/json')
         
+        # Overlay favorites for the logged-in user
+        payload = json.loads(body)
+        db = db or get_db()
+        cursor = db.cursor(cursor_factory=RealDictCursor)
+        favorited, _ = load_user_overlay(cursor, current_user['user_id'],
+                                         [comp['id'] for comp in payload['competitions']],
+                                         include_votes=False, redis=get_redis())
         cursor.close()
-        return jsonify({
-            'competitions': comps,
-            'all_tags': all_tags
-        })
+        for comp in payload['competitions']:
+            comp['is_favorited'] = comp['id'] in favorited
+        return jsonify(payload)
+    
+    except InvalidCursor:
+        raise
     
     except Exception as e:
         app.logger.error(f"API error: {e}")
         return jsonify({'error': 'Failed to load competitions', 'competitions': [], 'all_tags': []}), 500
 
 
+def render_competitions_listing(db, search, tag_filter, sort_by, page_cursor, limit):
+    """Build one user-independent /api/competitions page as a JSON string"""
+    if sort_by == 'trending':
+        # The listing orders by the stored scores
+        refresh_trending(db)
+    cursor = db.cursor(cursor_factory=RealDictCursor)
+    
+    # The page itself is read as compact records from a tuple cursor
+    where, params, search_filter = listing_filter(
+        "c.deleted_at IS NULL AND c.is_archived = FALSE AND c.status = 'active'", search, tag_filter)
+    rows_cursor = db.cursor()
+    comps, next_cursor = fetch_competition_page(
+        rows_cursor, ', '.join(f'c.{column}' for column in COMPETITION_LISTING_COLUMNS),
+        where, params, sort_by, page_cursor, limit, search_filter=search_filter,
+        record_class=CompetitionListingRecord)
+    rows_cursor.close()
+    
+    # Vote counts and percentages
+    attach_tallies(cursor, comps, percentages=True)
+    for comp in comps:
+        comp['is_favorited'] = False
+    
+    # Get all unique tags
+    cursor.execute("""
+        SELECT DISTINCT unnest(tags) as tag 
+        FROM competitions 
+        WHERE deleted_at IS NULL AND is_archived = FALSE 
+            AND tags IS NOT NULL AND array_length(tags, 1) > 0
+        ORDER BY tag
+    """)
+    all_tags = [row['tag'] for row in cursor.fetchall()]
+    
+    cursor.close()
+    return app.json.dumps({
+        'competitions': comps,
+        'all_tags': all_tags,
+        'next_cursor': next_cursor
+    })
+
+
 @app.route("/", methods=['POST','GET'])
 def hello():
     """Redirect to competitions if logged in, else to login"""
-    token = get_auth_token_from_request()
-    if token:
-        try:
-            verify_jwt_token(token)
-            return redirect(url_for('competitions'))
-        except AuthError:
-            pass
+    if get_current_user():
+        return redirect(url_for('competitions'))
     
     return redirect(url_for('login'))
 
@@ -490,6 +677,29 @@ def ready():
     return jsonify(status="ready"), 200
 
 
+@app.route("/api/admin/runtime-stats", methods=['GET'])
+@admin_required
+def get_runtime_stats():
+    """Connection pool, cache and SSE client statistics for this worker process"""
+    return jsonify({
+        'pid': os.getpid(),
+        'hostname': hostname,
+        'db_pool': db_pool.stats(),
+        'response_cache': {competitions_cache.name: competitions_cache.stats(),
+                           comments_cache.name: comments_cache.stats()},
+        'sse': live_updates.stats(),
+        'auth': token_cache.stats(),
+        'view_counts': view_flusher.stats()
+    })
+
+
+@app.route("/metrics", methods=['GET'])
+def prometheus_metrics():
+    """Request, database, Redis and SSE metrics of this host's workers in
+    Prometheus text format"""
+    return app.response_class(request_metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route("/api/admin/competitions", methods=['POST'])
 @admin_required
 def create_competition():
@@ -525,6 +735,7 @@ def create_competition():
         comp = cursor.fetchone()
         db.commit()
         cursor.close()
+        invalidate_listing_caches()
         
         status_info = f" (scheduled to start at {scheduled_start})" if scheduled_start else ""
         app.logger.info(f"Admin {g.user['username']} created competition: {name}{status_info}")
@@ -549,6 +760,7 @@ def close_competition(comp_id):
         )
         db.commit()
         cursor.close()
+        invalidate_listing_caches()
         
         app.logger.info(f"Admin {g.user['username']} closed competition {comp_id}")
         return jsonify({'message': 'Competition closed'}), 200
@@ -572,6 +784,7 @@ def open_competition(comp_id):
         )
         db.commit()
         cursor.close()
+        invalidate_listing_caches()
         
         app.logger.info(f"Admin {g.user['username']} reopened competition {comp_id}")
         return jsonify({'message': 'Competition reopened'}), 200
@@ -596,6 +809,12 @@ def delete_competition(comp_id):
         cursor.execute("DELETE FROM competitions WHERE id = %s", (comp_id,))
         db.commit()
         cursor.close()
+        invalidate_listing_caches()
+        
+        try:
+            scoreboard.drop(get_redis(), comp_id)
+        except RedisError as e:
+            app.logger.warning(f"Failed to drop live scoreboard for {comp_id}: {e}")
         
         app.logger.info(f"Admin {g.user['username']} deleted competition {comp_id}")
         return jsonify({'message': 'Competition deleted'}), 200
@@ -607,23 +826,33 @@ def delete_competition(comp_id):
 
 @app.route("/api/admin/competitions/<int:comp_id>/scores", methods=['GET'])
 def get_competition_scores(comp_id):
-    """Get live scores for a competition"""
+    """Get live scores for a competition
+
+    ``?source=live`` (default) serves from the Redis scoreboard, seeding it
+    from Postgres on a miss; ``?source=db`` always reads Postgres.
+    """
     try:
+        if request.args.get('source', 'live') == 'live':
+            try:
+                tally = scoreboard.get_scores(get_redis(), comp_id)
+            except RedisError as e:
+                app.logger.warning(f"Live scoreboard unavailable: {e}")
+                tally = None
+            if tally is not None:
+                return jsonify({'competition_id': comp_id, 'a': tally['a'], 'b': tally['b'], 'source': 'live'})
+        
         db = get_db()
         cursor = db.cursor(cursor_factory=RealDictCursor)
         
-        cursor.execute("""
-            SELECT vote, COUNT(*) as count 
-            FROM votes 
-            WHERE competition_id = %s 
-            GROUP BY vote
-        """, (comp_id,))
-        
-        votes = cursor.fetchall()
+        if request.args.get('source', 'live') == 'live':
+            tally, source = get_live_scores(cursor, comp_id)
+        else:
+            tally, source = load_vote_counts(cursor, [comp_id])[comp_id], 'db'
         result = {
             'competition_id': comp_id,
-            'a': next((v['count'] for v in votes if v['vote'] == 'a'), 0),
-            'b': next((v['count'] for v in votes if v['vote'] == 'b'), 0)
+            'a': tally['a'],
+            'b': tally['b'],
+            'source': source
         }
         cursor.close()
         return jsonify(result)
@@ -678,6 +907,7 @@ def schedule_competition(comp_id):
         """, (scheduled_start, scheduled_end, comp_id))
         db.commit()
         cursor.close()
+        invalidate_listing_caches()
         
         app.logger.info(f'Admin {g.user["username"]} scheduled competition {comp_id} from {scheduled_start} to {scheduled_end}')
         return jsonify({'success': True, 'message': 'Competition scheduled successfully'})
@@ -690,7 +920,8 @@ def schedule_competition(comp_id):
 @admin_required
 def admin_dashboard():
     """Admin dashboard for managing competitions"""
-    return render_template('admin_dashboard_enhanced.html', user=get_current_user(), option_a=option_a, option_b=option_b)
+    return render_template('admin_dashboard_enhanced.html', user=get_current_user(), option_a=option_a, option_b=option_b,
+                           vote_stream_url=VOTE_STREAM_URL)
 
 
 @app.route("/admin/profile")
@@ -821,33 +1052,26 @@ def get_user_favorites():
         db = get_db()
         cursor = db.cursor(cursor_factory=RealDictCursor)
         
-        cursor.execute("""
+        limit = parse_page_size(request.args.get('limit'))
+        sql, params = apply_keyset("""
             SELECT c.id, c.name, c.description, c.option_a, c.option_b, 
                    c.status, c.tags, c.image_url, c.created_at,
                    uf.created_at as favorited_at
             FROM user_favorites uf
             JOIN competitions c ON uf.competition_id = c.id
             WHERE uf.user_id = %s AND c.deleted_at IS NULL
-            ORDER BY uf.created_at DESC
-        """, (current_user['user_id'],))
-        favorites = cursor.fetchall()
+        """, [current_user['user_id']], FAVORITE_SORT_KEYS, 'favorited', request.args.get('cursor'), limit)
+        cursor.execute(sql, params)
+        favorites, next_cursor = paginate(cursor.fetchall(), limit, 'favorited', FAVORITE_SORT_KEYS)
         
-        # Get vote counts for each
-        for comp in favorites:
-            cursor.execute("""
-                SELECT vote, COUNT(*) as count 
-                FROM votes 
-                WHERE competition_id = %s 
-                GROUP BY vote
-            """, (comp['id'],))
-            votes = {row['vote']: row['count'] for row in cursor.fetchall()}
-            comp['votes_a'] = votes.get('a', 0)
-            comp['votes_b'] = votes.get('b', 0)
-            comp['total_votes'] = comp['votes_a'] + comp['votes_b']
+        # Get vote counts for all of them at once
+        attach_tallies(cursor, favorites)
         
         cursor.close()
-        return jsonify(favorites)
+        return paged_json(favorites, next_cursor)
     
+    except InvalidCursor:
+        raise
     except Exception as e:
         app.logger.error(f"Error getting favorites: {e}")
         return jsonify({'error': 'Failed to load favorites'}), 500
@@ -880,6 +1104,12 @@ def toggle_favorite(comp_id):
         
         db.commit()
         cursor.close()
+        
+        try:
+            user_overlay.set_favorite(get_redis(), current_user['user_id'], comp_id, request.method == 'POST')
+        except RedisError as e:
+            # The overlay expires after USER_OVERLAY_TTL at the latest
+            app.logger.warning(f"User overlay update failed: {e}")
         return jsonify({'message': message}), 200
     
     except Exception as e:
@@ -894,22 +1124,11 @@ def get_trending():
         db = get_db()
         cursor = db.cursor(cursor_factory=RealDictCursor)
         
-        # Update trending scores first
-        cursor.execute("SELECT calculate_trending_score()")
-        db.commit()
-        
-        cursor.execute("""
-            SELECT id, name, description, tags, image_url, trending_score, participant_count
-            FROM competitions
-            WHERE deleted_at IS NULL AND is_archived = FALSE 
-            AND status = 'active' AND trending_score > 0
-            ORDER BY trending_score DESC
-            LIMIT 10
-        """)
-        trending = cursor.fetchall()
+        result = load_trending(db, cursor, "id, name, description, tags, image_url, trending_score, participant_count",
+                               TRENDING_LIMIT)
         
         cursor.close()
-        return jsonify(trending)
+        return jsonify(result)
     
     except Exception as e:
         app.logger.error(f"Error getting trending: {e}")
@@ -932,31 +1151,17 @@ def competition_comments(comp_id):
         current_user = get_current_user()
         
         if request.method == 'GET':
-            # Get comments with user info
-            cursor.execute("""
-                SELECT cc.id, cc.comment_text, cc.parent_id, cc.likes_count, 
-                       cc.created_at, cc.updated_at,
-                       u.username, u.id as user_id
-                FROM competition_comments cc
-                JOIN users u ON cc.user_id = u.id
-                WHERE cc.competition_id = %s AND cc.deleted_at IS NULL
-                ORDER BY cc.created_at DESC
-            """, (comp_id,))
-            comments = cursor.fetchall()
-            
-            # Check which comments current user has liked
-            cursor.execute("""
-                SELECT comment_id 
-                FROM comment_likes 
-                WHERE user_id = %s AND comment_id = ANY(%s)
-            """, (current_user['user_id'], [c['id'] for c in comments]))
-            liked_ids = [row['comment_id'] for row in cursor.fetchall()]
-            
-            for comment in comments:
-                comment['is_liked'] = comment['id'] in liked_ids
+            # Page of threads with nested replies, shared by all users
+            page_cursor = request.args.get('cursor') or None
+            limit = parse_page_size(request.args.get('limit'), default=COMMENTS_PAGE_SIZE)
+            cache_params = {'cursor': page_cursor, 'limit': limit}
+            generation, body = comments_cache.get(get_redis(), cache_params, scope=comp_id)
+            if body is None:
+                threads, next_cursor = load_threads(cursor, comp_id, page_cursor, limit)
+                body = app.json.dumps({'comments': threads, 'next_cursor': next_cursor})
+                comments_cache.set(get_redis(), generation, cache_params, body, scope=comp_id)
             
-            cursor.close()
-            return jsonify(comments)
+            return comment_page_response(cursor, body, current_user['user_id'])
         
         else:  # POST
             comment_text = request.json.get('comment_text', '').strip()
@@ -974,6 +1179,7 @@ def competition_comments(comp_id):
             new_comment = cursor.fetchone()
             db.commit()
             cursor.close()
+            comments_cache.invalidate(get_redis(), scope=comp_id)
             
             return jsonify({
                 **new_comment,
@@ -983,11 +1189,42 @@ def competition_comments(comp_id):
                 'is_liked': False
             }), 201
     
+    except InvalidCursor:
+        raise
+    
     except Exception as e:
         app.logger.error(f"Error with comments: {e}")
         return jsonify({'error': 'Failed to process comment'}), 500
 
 
+@app.route("/api/competitions/<int:comp_id>/comments/<int:comment_id>/replies", methods=['GET'])
+@login_required
+def comment_replies(comp_id, comment_id):
+    """Page through the replies to one comment, oldest first"""
+    try:
+        db = get_db()
+        cursor = db.cursor(cursor_factory=RealDictCursor)
+        current_user = get_current_user()
+        
+        page_cursor = request.args.get('cursor') or None
+        limit = parse_page_size(request.args.get('limit'), default=COMMENTS_PAGE_SIZE)
+        cache_params = {'parent_id': comment_id, 'cursor': page_cursor, 'limit': limit}
+        generation, body = comments_cache.get(get_redis(), cache_params, scope=comp_id)
+        if body is None:
+            replies, next_cursor = load_replies(cursor, comp_id, comment_id, page_cursor, limit)
+            body = app.json.dumps({'comments': replies, 'next_cursor': next_cursor})
+            comments_cache.set(get_redis(), generation, cache_params, body, scope=comp_id)
+        
+        return comment_page_response(cursor, body, current_user['user_id'])
+    
+    except InvalidCursor:
+        raise
+    
+    except Exception as e:
+        app.logger.error(f"Error loading replies: {e}")
+        return jsonify({'error': 'Failed to load replies'}), 500
+
+
 @app.route("/api/comments/<int:comment_id>/like", methods=['POST', 'DELETE'])
 @login_required
 def toggle_comment_like(comment_id):
@@ -1010,9 +1247,23 @@ def toggle_comment_like(comment_id):
                 WHERE comment_id = %s AND user_id = %s
             """, (comment_id, current_user['user_id']))
             message = 'Comment unliked'
+        changed = cursor.rowcount > 0
         
+        cursor.execute("SELECT competition_id FROM competition_comments WHERE id = %s", (comment_id,))
+        comment = cursor.fetchone()
         db.commit()
         cursor.close()
+        
+        if changed and comment:
+            # A burst of likes on a hot thread bumps the generation once;
+            # likes_count in cached pages lags by at most the cache TTL
+            try:
+                redis = get_redis()
+                pipe = redis.pipeline()
+                comments_cache.invalidate_throttled(redis, pipe, scope=comment[0])
+                redis_scripts.execute(redis, pipe)
+            except RedisError as e:
+                app.logger.warning(f"Comment cache invalidation failed: {e}")
         return jsonify({'message': message}), 200
     
     except Exception as e:
@@ -1031,7 +1282,7 @@ def delete_comment(comment_id):
         
         # Check if user owns the comment
         cursor.execute("""
-            SELECT user_id FROM competition_comments WHERE id = %s
+            SELECT user_id, competition_id FROM competition_comments WHERE id = %s
         """, (comment_id,))
         comment = cursor.fetchone()
         
@@ -1049,6 +1300,7 @@ def delete_comment(comment_id):
         
         db.commit()
         cursor.close()
+        comments_cache.invalidate(get_redis(), scope=comment['competition_id'])
         return jsonify({'message': 'Comment deleted'}), 200
     
     except Exception as e:
@@ -1060,6 +1312,14 @@ def delete_comment(comment_id):
 def increment_view_count(comp_id):
     """Increment view count for a competition"""
     try:
+        try:
+            # Buffered in Redis and written to Postgres in periodic batches
+            record_view(get_redis(), comp_id)
+            view_flusher.ensure_running()
+            return jsonify({'message': 'View counted'}), 200
+        except RedisError as e:
+            app.logger.warning(f"View buffer unavailable, writing directly: {e}")
+        
         db = get_db()
         cursor = db.cursor()
         
@@ -1109,6 +1369,7 @@ def archive_competition(comp_id):
         """, (comp_id,))
         db.commit()
         cursor.close()
+        invalidate_listing_caches()
         
         app.logger.info(f"Admin {g.user['username']} archived competition {comp_id}")
         return jsonify({'message': 'Competition archived successfully'}), 200
@@ -1133,6 +1394,7 @@ def unarchive_competition(comp_id):
         """, (comp_id,))
         db.commit()
         cursor.close()
+        invalidate_listing_caches()
         
         app.logger.info(f"Admin {g.user['username']} unarchived competition {comp_id}")
         return jsonify({'message': 'Competition restored successfully'}), 200
@@ -1173,6 +1435,7 @@ def duplicate_competition(comp_id):
         new_comp = cursor.fetchone()
         db.commit()
         cursor.close()
+        invalidate_listing_caches()
         
         app.logger.info(f"Admin {g.user['username']} duplicated competition {comp_id} to {new_comp['id']}")
         return jsonify(new_comp), 201
@@ -1197,6 +1460,7 @@ def soft_delete_competition(comp_id):
         """, (comp_id,))
         db.commit()
         cursor.close()
+        invalidate_listing_caches()
         
         app.logger.info(f"Admin {g.user['username']} soft-deleted competition {comp_id}")
         return jsonify({'message': 'Competition moved to trash'}), 200
@@ -1221,6 +1485,7 @@ def restore_competition(comp_id):
         """, (comp_id,))
         db.commit()
         cursor.close()
+        invalidate_listing_caches()
         
         app.logger.info(f"Admin {g.user['username']} restored competition {comp_id}")
         return jsonify({'message': 'Competition restored successfully'}), 200
@@ -1261,6 +1526,7 @@ def update_competition(comp_id):
         comp = cursor.fetchone()
         db.commit()
         cursor.close()
+        invalidate_listing_caches()
         
         app.logger.info(f"Admin {g.user['username']} updated competition {comp_id}")
         return jsonify(comp), 200
@@ -1287,7 +1553,7 @@ def get_admin_stats():
         active_comps = cursor.fetchone()['total']
         
         # Total votes
-        cursor.execute("SELECT COUNT(*) as total FROM votes")
+        cursor.execute("SELECT COALESCE(SUM(total_votes), 0) as total FROM competition_vote_counts")
         total_votes = cursor.fetchone()['total']
         
         # Total users
@@ -1320,49 +1586,32 @@ def search_competitions():
         db = get_db()
         cursor = db.cursor(cursor_factory=RealDictCursor)
         
-        sql = """
-            SELECT id, name, description, option_a, option_b, tags, image_url, 
-                   status, created_at, updated_at, is_archived, archived_at, deleted_at
-            FROM competitions
-            WHERE (name ILIKE %s OR description ILIKE %s OR %s = ANY(tags))
-        """
-        params = [f'%{query}%', f'%{query}%', query]
+        search_filter = build_search(query, alias='c')
+        where = f"({search_filter.where} OR %s = ANY(c.tags))"
         
         if not include_archived:
-            sql += " AND is_archived = FALSE"
+            where += " AND c.is_archived = FALSE"
         
         if not include_deleted:
-            sql += " AND deleted_at IS NULL"
+            where += " AND c.deleted_at IS NULL"
         
-        sql += " ORDER BY created_at DESC LIMIT 50"
+        comps, next_cursor = fetch_competition_page(
+            cursor,
+            """c.id, c.name, c.description, c.option_a, c.option_b, c.tags, c.image_url, 
+               c.status, c.created_at, c.updated_at, c.is_archived, c.archived_at, c.deleted_at""",
+            where, search_filter.where_params + [query], 'relevance' if query else 'newest',
+            request.args.get('cursor'),
+            parse_page_size(request.args.get('limit'), default=ADMIN_SEARCH_PAGE_SIZE),
+            search_filter=search_filter)
         
-        cursor.execute(sql, params)
-        comps = cursor.fetchall()
-        
-        # Get vote counts
-        for comp in comps:
-            cursor.execute("""
-                SELECT vote, COUNT(*) as count 
-                FROM votes 
-                WHERE competition_id = %s 
-                GROUP BY vote
-            """, (comp['id'],))
-            votes = {row['vote']: row['count'] for row in cursor.fetchall()}
-            comp['votes_a'] = votes.get('a', 0)
-            comp['votes_b'] = votes.get('b', 0)
-            comp['total_votes'] = comp['votes_a'] + comp['votes_b']
-            
-            # Calculate percentages
-            if comp['total_votes'] > 0:
-                comp['percentage_a'] = round((comp['votes_a'] / comp['total_votes']) * 100, 1)
-                comp['percentage_b'] = round((comp['votes_b'] / comp['total_votes']) * 100, 1)
-            else:
-                comp['percentage_a'] = 0
-                comp['percentage_b'] = 0
+        # Get vote counts and percentages
+        attach_tallies(cursor, comps, percentages=True)
         
         cursor.close()
-        return jsonify(comps)
+        return paged_json(comps, next_cursor)
     
+    except InvalidCursor:
+        raise
     except Exception as e:
         app.logger.error(f"Error searching competitions: {e}")
         return jsonify({'error': 'Search failed'}), 500
@@ -1376,18 +1625,21 @@ def get_trash():
         db = get_db()
         cursor = db.cursor(cursor_factory=RealDictCursor)
         
-        cursor.execute("""
+        limit = parse_page_size(request.args.get('limit'))
+        sql, params = apply_keyset("""
             SELECT id, name, description, option_a, option_b, tags, image_url,
                    status, created_at, updated_at, deleted_at
             FROM competitions
             WHERE deleted_at IS NOT NULL
-            ORDER BY deleted_at DESC
-        """)
-        comps = cursor.fetchall()
+        """, [], TRASH_SORT_KEYS, 'deleted', request.args.get('cursor'), limit)
+        cursor.execute(sql, params)
+        comps, next_cursor = paginate(cursor.fetchall(), limit, 'deleted', TRASH_SORT_KEYS)
         cursor.close()
         
-        return jsonify(comps)
+        return paged_json(comps, next_cursor)
     
+    except InvalidCursor:
+        raise
     except Exception as e:
         app.logger.error(f"Error fetching trash: {e}")
         return jsonify({'error': 'Failed to fetch deleted competitions'}), 500
@@ -1401,58 +1653,53 @@ def get_archived():
         db = get_db()
         cursor = db.cursor(cursor_factory=RealDictCursor)
         
-        cursor.execute("""
+        limit = parse_page_size(request.args.get('limit'))
+        sql, params = apply_keyset("""
             SELECT id, name, description, option_a, option_b, tags, image_url,
                    status, created_at, updated_at, is_archived, archived_at
             FROM competitions
             WHERE is_archived = TRUE AND deleted_at IS NULL
-            ORDER BY archived_at DESC
-        """)
-        comps = cursor.fetchall()
+        """, [], ARCHIVE_SORT_KEYS, 'archived', request.args.get('cursor'), limit)
+        cursor.execute(sql, params)
+        comps, next_cursor = paginate(cursor.fetchall(), limit, 'archived', ARCHIVE_SORT_KEYS)
         
         # Get vote counts
-        for comp in comps:
-            cursor.execute("""
-                SELECT vote, COUNT(*) as count 
-                FROM votes 
-                WHERE competition_id = %s 
-                GROUP BY vote
-            """, (comp['id'],))
-            votes = {row['vote']: row['count'] for row in cursor.fetchall()}
-            comp['votes_a'] = votes.get('a', 0)
-            comp['votes_b'] = votes.get('b', 0)
-            comp['total_votes'] = comp['votes_a'] + comp['votes_b']
+        attach_tallies(cursor, comps)
         
         cursor.close()
-        return jsonify(comps)
+        return paged_json(comps, next_cursor)
     
+    except InvalidCursor:
+        raise
     except Exception as e:
         app.logger.error(f"Error fetching archived competitions: {e}")
         return jsonify({'error': 'Failed to fetch archived competitions'}), 500
 
 
-@app.route("/api/admin/vote-stream")
-@admin_required
-def vote_stream():
-    """Server-Sent Events stream for real-time vote updates"""
+def vote_event_stream():
+    """SSE response fed from this process's shared vote_updates subscriber
+
+    ``?competition_id=1,2`` limits the stream to those competitions.
+    """
+    try:
+        competition_ids = parse_competition_ids(request.args.getlist('competition_id'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     def event_stream():
+        subscription = live_updates.subscribe(competition_ids)
         try:
-            # Create a direct Redis connection without using Flask's g
-            from redis import Redis
-            redis_conn = Redis(host=redis_host, port=redis_port, db=0, socket_timeout=5)
-            pubsub = redis_conn.pubsub()
-            pubsub.subscribe('vote_updates')
-            
             # Send initial connection message
-            yield f"data: {json.dumps({'type': 'connected'})}\n\n"
-            
-            # Listen for vote updates
-            for message in pubsub.listen():
-                if message['type'] == 'message':
-                    yield f"data: {message['data'].decode('utf-8')}\n\n"
+            yield connected_frame(competition_ids)
+
+            while True:
+                messages = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                yield data_frames(messages) if messages else heartbeat_frame()
         except Exception as e:
             app.logger.error(f"SSE stream error: {e}")
-    
+        finally:
+            live_updates.unsubscribe(subscription)
+
     return app.response_class(
         event_stream(),
         mimetype='text/event-stream',
@@ -1464,37 +1711,18 @@ def vote_stream():
     )
 
 
+@app.route("/api/admin/vote-stream")
+@admin_required
+def vote_stream():
+    """Server-Sent Events stream for real-time vote updates"""
+    return vote_event_stream()
+
+
 @app.route("/api/user/vote-stream")
 @login_required
 def user_vote_stream():
     """Server-Sent Events stream for real-time vote updates (user version)"""
-    def event_stream():
-        try:
-            # Create a direct Redis connection without using Flask's g
-            from redis import Redis
-            redis_conn = Redis(host=redis_host, port=redis_port, db=0, socket_timeout=5)
-            pubsub = redis_conn.pubsub()
-            pubsub.subscribe('vote_updates')
-            
-            # Send initial connection message
-            yield f"data: {json.dumps({'type': 'connected'})}\n\n"
-            
-            # Listen for vote updates
-            for message in pubsub.listen():
-                if message['type'] == 'message':
-                    yield f"data: {message['data'].decode('utf-8')}\n\n"
-        except Exception as e:
-            app.logger.error(f"SSE stream error: {e}")
-    
-    return app.response_class(
-        event_stream(),
-        mimetype='text/event-stream',
-        headers={
-            'Cache-Control': 'no-cache',
-            'X-Accel-Buffering': 'no',
-            'Connection': 'keep-alive'
-        }
-    )
+    return vote_event_stream()
 
 
 if __name__ == "__main__":
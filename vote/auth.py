@@ -1,7 +1,12 @@
 """Authentication module for voting app"""
 import os
 import hashlib
+import hmac
 import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify, g, session, redirect, url_for
@@ -10,6 +15,17 @@ import jwt
 JWT_SECRET = os.getenv('JWT_SECRET', 'dev-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRY_HOURS = 24
+JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', 10000))
+
+# Password hashing. Hashes are stored as pbkdf2_sha256$<iterations>$<salt>$<hash>;
+# the original salt$hash format is still accepted and always used 100000.
+PASSWORD_HASH_SCHEME = 'pbkdf2_sha256'
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', 100000))
+LEGACY_HASH_ITERATIONS = 100000
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+# Hashes allowed to wait for a worker before new ones are rejected
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE_LIMIT', 8))
+PASSWORD_HASH_TIMEOUT = 10
 
 
 class AuthError(Exception):
@@ -17,23 +33,146 @@ class AuthError(Exception):
     pass
 
 
+class PasswordHashingBusy(Exception):
+    """Raised when the password hashing pool is saturated"""
+    pass
+
+
+class TokenCache:
+    """Bounded LRU of verified token payloads, keyed by the token's SHA-256
+    digest so raw tokens are never held, and dropped once ``exp`` passes"""
+
+    def __init__(self, maxsize=JWT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'verifications': 0, 'cache_hits': 0, 'request_hits': 0, 'memo_reads': 0,
+                       'expired': 0, 'evictions': 0}
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                return None
+            if payload.get('exp') is not None and payload['exp'] <= time.time():
+                del self._entries[key]
+                self._stats['expired'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['cache_hits'] += 1
+        return dict(payload)
+
+    def put(self, token, payload):
+        if self.maxsize <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = dict(payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def stats(self):
+        """Signature checks performed and saved (by this cache and by the
+        per-request memo) in this process; ``memo_reads`` counts every read
+        of the memo and is not part of ``checks_saved``"""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['size'] = len(self._entries)
+        snapshot['maxsize'] = self.maxsize
+        snapshot['checks_saved'] = snapshot['cache_hits'] + snapshot['request_hits']
+        return snapshot
+
+
+token_cache = TokenCache()
+
+
+_hash_executor = None
+_hash_executor_pid = None
+_hash_executor_lock = threading.Lock()
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT)
+
+
+def _get_hash_executor():
+    global _hash_executor, _hash_executor_pid
+    with _hash_executor_lock:
+        # Executor threads do not survive a fork, so build one per process
+        if _hash_executor is None or _hash_executor_pid != os.getpid():
+            _hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                                thread_name_prefix='password-hash')
+            _hash_executor_pid = os.getpid()
+        return _hash_executor
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations).hex()
+
+
+def _run_pbkdf2(password, salt, iterations):
+    """Run PBKDF2 on the bounded pool, failing fast when it is saturated.
+
+    hashlib releases the GIL while hashing, so the pool caps how many CPU
+    cores logins and registrations can take from vote traffic.
+    """
+    if not _hash_slots.acquire(blocking=False):
+        raise PasswordHashingBusy('Password hashing pool is saturated')
+    try:
+        future = _get_hash_executor().submit(_pbkdf2, password, salt, iterations)
+    except Exception:
+        _hash_slots.release()
+        raise
+    # The slot is held until the hash finishes, even if we stop waiting
+    future.add_done_callback(lambda _: _hash_slots.release())
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        raise PasswordHashingBusy('Password hashing timed out')
+
+
+def _parse_password_hash(hash_obj):
+    """Return (iterations, salt, hash) for current and legacy formats"""
+    parts = hash_obj.split('$')
+    if len(parts) == 4 and parts[0] == PASSWORD_HASH_SCHEME:
+        return int(parts[1]), parts[2], parts[3]
+    if len(parts) == 2:
+        return LEGACY_HASH_ITERATIONS, parts[0], parts[1]
+    raise ValueError('Unrecognized password hash format')
+
+
 def hash_password(password: str) -> str:
     """Hash password using PBKDF2"""
     salt = secrets.token_hex(32)
-    iterations = 100000
-    hash_obj = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations)
-    return f"{salt}${hash_obj.hex()}"
+    hash_hex = _run_pbkdf2(password, salt, PASSWORD_HASH_ITERATIONS)
+    return f"{PASSWORD_HASH_SCHEME}${PASSWORD_HASH_ITERATIONS}${salt}${hash_hex}"
 
 
 def verify_password(password: str, hash_obj: str) -> bool:
     """Verify password against hash"""
     try:
-        salt, stored_hash = hash_obj.split('$')
-        iterations = 100000
-        computed_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations).hex()
-        return computed_hash == stored_hash
+        iterations, salt, stored_hash = _parse_password_hash(hash_obj)
+    except (ValueError, AttributeError):
+        return False
+    computed_hash = _run_pbkdf2(password, salt, iterations)
+    return hmac.compare_digest(computed_hash, stored_hash)
+
+
+def needs_rehash(hash_obj: str) -> bool:
+    """True for legacy hashes or ones made with a different iteration count"""
+    try:
+        iterations, _, _ = _parse_password_hash(hash_obj)
     except (ValueError, AttributeError):
         return False
+    return not hash_obj.startswith(f'{PASSWORD_HASH_SCHEME}$') or iterations != PASSWORD_HASH_ITERATIONS
 
 
 def create_jwt_token(user_id: int, username: str, is_admin: bool = False) -> str:
@@ -49,9 +188,15 @@ def create_jwt_token(user_id: int, username: str, is_admin: bool = False) -> str
 
 
 def verify_jwt_token(token: str) -> dict:
-    """Verify JWT token and return payload"""
+    """Verify JWT token and return payload, skipping the signature check for
+    tokens verified recently"""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
+        token_cache.count('verifications')
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        token_cache.put(token, payload)
         return payload
     except jwt.ExpiredSignatureError:
         raise AuthError('Token expired')
@@ -114,15 +259,24 @@ def admin_required(f):
 
 
 def get_current_user():
-    """Get current user from g or token"""
+    """Get current user from g or token, verifying at most once per request"""
     if hasattr(g, 'user'):
+        token_cache.count('memo_reads')
+        # Decorated routes set g.user themselves, so only the first repeat
+        # of a verification made here saves one
+        if g.pop('_user_verified_here', False):
+            token_cache.count('request_hits')
         return g.user
     
+    user = None
     token = get_auth_token_from_request()
     if token:
         try:
-            return verify_jwt_token(token)
+            user = verify_jwt_token(token)
         except AuthError:
-            return None
+            pass
     
-    return None
+    # Remember anonymous/invalid results too, so they are not re-checked
+    g.user = user
+    g._user_verified_here = token is not None
+    return user
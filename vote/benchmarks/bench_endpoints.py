@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""Benchmark the vote app's hot endpoints through the Flask test client.
+
+Seeds ``bench_user_<n>`` users, ``bench-competition-<n>`` competitions, votes
+and favorites into the configured Postgres (schema from init_db.py and the
+migrations must already exist), then drives ``vote()``, ``competitions()``,
+``api_competitions()``, ``get_trending()``, ``get_user_stats()`` and the SSE
+stream in-process and reports per endpoint: throughput, p50/p95/p99 latency
+and SQL statements per request (from the app's request metrics, see
+``metrics.py``).
+
+    python benchmarks/bench_endpoints.py --users 1000 --competitions 200 --votes 100000 \\
+        --requests 300 --output endpoints.json
+
+Use a scratch database and Redis: votes cast by the benchmark are queued for
+the worker like real ones, and cleanup waits (up to ``--drain-timeout``
+seconds) for the worker to write them first. ``--fake-redis`` runs against an
+in-process fakeredis server instead, where nothing is ingested. Seeded rows
+are removed afterwards unless ``--keep`` is given. The repo has no
+``vote.html``, so a minimal one is supplied to let ``vote()`` render.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import psycopg2
+from jinja2 import ChoiceLoader, DictLoader
+from redis.exceptions import ResponseError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as vote_app  # noqa: E402
+import redis_client  # noqa: E402
+import vote_transport  # noqa: E402
+from auth import create_jwt_token  # noqa: E402
+
+USER_PREFIX = 'bench_user_'
+COMPETITION_PREFIX = 'bench-competition-'
+TAGS = ['music', 'sports', 'food', 'tech', 'movies', 'games']
+LISTING_SORTS = ['newest', 'popular', 'trending', 'ending_soon']
+
+VOTE_TEMPLATE = """<!DOCTYPE html>
+<html><body>
+{% if error %}<p class="error">{{ error }}</p>{% endif %}
+{% if competition %}<h1>{{ competition.name }}</h1>
+<p>{{ competition.option_a }} vs {{ competition.option_b }}</p>{% endif %}
+{% if vote %}<p>Your vote: {{ vote }}</p>{% endif %}
+{% if user %}<p>Signed in as {{ user.username }}</p>{% endif %}
+</body></html>
+"""
+
+
+def seed(conn, users, competitions, votes, favorites):
+    """Insert the dataset; returns ([(user_id, username)], [competition_id])"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO users (username, email, password_hash)
+        SELECT %(prefix)s || i, %(prefix)s || i || '@bench.local', 'bench'
+        FROM generate_series(1, %(users)s) AS i
+        RETURNING id, username
+    """, {'prefix': USER_PREFIX, 'users': users})
+    user_rows = cursor.fetchall()
+
+    cursor.execute("""
+        INSERT INTO competitions (name, description, option_a, option_b, status, tags, created_at)
+        SELECT %(prefix)s || i, 'Benchmark competition ' || i, 'Option A', 'Option B', 'active',
+               ARRAY[%(tags)s[1 + i %% %(n)s], %(tags)s[1 + (i * 7) %% %(n)s]],
+               NOW() - (i || ' minutes')::interval
+        FROM generate_series(1, %(competitions)s) AS i
+        RETURNING id
+    """, {'prefix': COMPETITION_PREFIX, 'competitions': competitions, 'tags': TAGS, 'n': len(TAGS)})
+    competition_ids = [row[0] for row in cursor.fetchall()]
+
+    # Spread votes over (user, competition) pairs, one vote per pair
+    cursor.execute("""
+        INSERT INTO votes (id, competition_id, user_id, vote, created_at)
+        SELECT 'user_' || u.id, c.id, u.id, CASE WHEN (u.id + c.id) %% 3 = 0 THEN 'b' ELSE 'a' END,
+               NOW() - ((u.id * 31 + c.id) %% 2880 || ' minutes')::interval
+        FROM unnest(%(users)s::int[]) WITH ORDINALITY AS u(id, n)
+        JOIN unnest(%(competitions)s::int[]) WITH ORDINALITY AS c(id, m)
+          ON (c.m + u.n) %% GREATEST(%(pairs)s / GREATEST(%(votes)s, 1), 1) = 0
+        LIMIT %(votes)s
+    """, {'users': [row[0] for row in user_rows], 'competitions': competition_ids,
+          'pairs': len(user_rows) * len(competition_ids), 'votes': votes})
+
+    cursor.execute("""
+        INSERT INTO user_favorites (user_id, competition_id)
+        SELECT u.id, c.id
+        FROM unnest(%(users)s::int[]) AS u(id)
+        CROSS JOIN LATERAL (
+            SELECT id FROM unnest(%(competitions)s::int[]) AS c(id)
+            ORDER BY (c.id * 17 + u.id) %% 101
+            LIMIT %(favorites)s
+        ) AS c
+        ON CONFLICT DO NOTHING
+    """, {'users': [row[0] for row in user_rows], 'competitions': competition_ids, 'favorites': favorites})
+    conn.commit()
+    cursor.close()
+    return user_rows, competition_ids
+
+
+def cleanup(conn):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM votes WHERE competition_id IN "
+                   "(SELECT id FROM competitions WHERE name LIKE %s)", (COMPETITION_PREFIX + '%',))
+    cursor.execute("DELETE FROM competitions WHERE name LIKE %s", (COMPETITION_PREFIX + '%',))
+    cursor.execute("DELETE FROM users WHERE username LIKE %s", (USER_PREFIX + '%',))
+    conn.commit()
+    cursor.close()
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, query_counts, errors, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(ordered, 0.50) * 1000, 3),
+            'p95': round(percentile(ordered, 0.95) * 1000, 3),
+            'p99': round(percentile(ordered, 0.99) * 1000, 3),
+            'mean': round(statistics.fmean(ordered) * 1000, 3),
+            'max': round(ordered[-1] * 1000, 3),
+        },
+        'queries_per_request': {
+            'mean': round(statistics.fmean(query_counts), 2),
+            'max': max(query_counts),
+        },
+    }
+
+
+class EndpointBench:
+    """Request functions for each benchmarked endpoint; each returns a status"""
+
+    def __init__(self, client, users, competition_ids):
+        self.client = client
+        self.users = users
+        self.competition_ids = competition_ids
+        self.tokens = {}
+
+    def _login(self, i):
+        user_id, username = self.users[i % len(self.users)]
+        if user_id not in self.tokens:
+            self.tokens[user_id] = create_jwt_token(user_id, username, False)
+        self.client.set_cookie('auth_token', self.tokens[user_id])
+        return user_id
+
+    def _competition(self, i):
+        return self.competition_ids[(i * 7) % len(self.competition_ids)]
+
+    def vote(self, i):
+        self._login(i)
+        return self.client.post(f'/vote/{self._competition(i)}', data={'vote': 'ab'[i % 2]}).status_code
+
+    def competitions(self, i):
+        self._login(i)
+        return self.client.get(f'/competitions?sort={LISTING_SORTS[i % len(LISTING_SORTS)]}').status_code
+
+    def api_competitions(self, i):
+        self._login(i)
+        return self.client.get(f'/api/competitions?sort={LISTING_SORTS[i % len(LISTING_SORTS)]}').status_code
+
+    def trending(self, i):
+        self._login(i)
+        return self.client.get('/api/competitions/trending').status_code
+
+    def user_stats(self, i):
+        self._login(i)
+        return self.client.get('/api/user/stats').status_code
+
+    def sse_connect(self, i):
+        """Open a stream and read its connected frame"""
+        self._login(i)
+        response = self.client.get(f'/api/user/vote-stream?competition_id={self._competition(i)}',
+                                   buffered=False)
+        next(iter(response.response))
+        response.close()
+        return response.status_code
+
+    def sse_vote_to_frame(self, i):
+        """Cast a vote while a stream is open and wait for its update frame;
+        includes the SSE coalescing window"""
+        self._login(0)
+        response = self.client.get('/api/user/vote-stream', buffered=False)
+        frames = iter(response.response)
+        next(frames)
+        # The same user flips their vote, so every vote changes the tally
+        status = self.client.post(f'/vote/{self.competition_ids[0]}', data={'vote': 'ab'[i % 2]}).status_code
+        frame = next(frames)
+        response.close()
+        if isinstance(frame, bytes):
+            frame = frame.decode()
+        return status if frame.startswith('data:') else 599
+
+
+ENDPOINTS = ['vote', 'competitions', 'api_competitions', 'trending', 'user_stats',
+             'sse_connect', 'sse_vote_to_frame']
+
+
+def sql_statements():
+    """SQL statements run by requests so far, as tallied by the app's metrics"""
+    return vote_app.request_metrics.total('vote_sql_statements_total')
+
+
+def run(bench, name, requests, warmup):
+    request = getattr(bench, name)
+    for i in range(warmup):
+        request(i)
+    latencies, query_counts, errors = [], [], 0
+    started = time.perf_counter()
+    for i in range(requests):
+        before = sql_statements()
+        request_started = time.perf_counter()
+        status = request(warmup + i)
+        latencies.append(time.perf_counter() - request_started)
+        query_counts.append(sql_statements() - before)
+        if status >= 400:
+            errors += 1
+    return summarize(latencies, query_counts, errors, time.perf_counter() - started)
+
+
+def use_fake_redis():
+    import fakeredis
+    server = fakeredis.FakeServer()
+    redis_client._client = fakeredis.FakeRedis(server=server)
+    redis_client._pubsub_client = fakeredis.FakeRedis(server=server)
+
+
+def use_vote_template():
+    """Serve VOTE_TEMPLATE as vote.html ahead of the app's own templates"""
+    vote_app.app.jinja_loader = ChoiceLoader([DictLoader({'vote.html': VOTE_TEMPLATE}),
+                                              vote_app.app.jinja_loader])
+
+
+def queued_votes(redis):
+    """Votes queued by the app and not yet written by the worker"""
+    if vote_transport.VOTE_TRANSPORT == 'list':
+        return redis.llen(vote_transport.LIST_KEY)
+    try:
+        groups = redis.xinfo_groups(vote_transport.STREAM_KEY)
+    except ResponseError:
+        # No stream yet
+        return 0
+    for group in groups:
+        name = group['name'].decode() if isinstance(group['name'], bytes) else group['name']
+        if name == vote_transport.STREAM_GROUP:
+            return group['pending'] + (group.get('lag') or 0)
+    return redis.xlen(vote_transport.STREAM_KEY)
+
+
+def wait_for_queue(redis, timeout):
+    """Wait for the worker to write the benchmark's votes before cleanup
+    deletes their competitions; returns the votes still queued"""
+    deadline = time.monotonic() + timeout
+    remaining = queued_votes(redis)
+    while remaining and time.monotonic() < deadline:
+        time.sleep(0.5)
+        remaining = queued_votes(redis)
+    # A list worker may still be writing the batch it popped last
+    time.sleep(1)
+    return remaining
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--competitions', type=int, default=200)
+    parser.add_argument('--votes', type=int, default=100000)
+    parser.add_argument('--favorites', type=int, default=5, help='favorites per user')
+    parser.add_argument('--requests', type=int, default=300, help='timed requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed requests per endpoint first')
+    parser.add_argument('--sse-requests', type=int, default=20, help='timed requests for sse_vote_to_frame')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument('--fake-redis', action='store_true', help='use an in-process fakeredis server')
+    parser.add_argument('--drain-timeout', type=float, default=60,
+                        help='seconds to wait for the worker to write queued votes before cleanup')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--keep', action='store_true', help='keep the seeded rows afterwards')
+    args = parser.parse_args()
+
+    if args.fake_redis:
+        use_fake_redis()
+    use_vote_template()
+    vote_app.app.logger.setLevel('WARNING')
+
+    conn = psycopg2.connect(vote_app.db_connection_string)
+    cleanup(conn)
+    print(f"[*] Seeding {args.users} users, {args.competitions} competitions, {args.votes} votes...")
+    started = time.perf_counter()
+    users, competition_ids = seed(conn, args.users, args.competitions, args.votes, args.favorites)
+    print(f"    seeded in {time.perf_counter() - started:.1f}s")
+
+    results = {}
+    keeper = None
+    try:
+        bench = EndpointBench(vote_app.app.test_client(), users, competition_ids)
+        for name in args.endpoints:
+            if name == 'sse_vote_to_frame':
+                # Keep the aggregate channel subscribed between streams so no
+                # update is published before the subscriber listens
+                keeper = vote_app.live_updates.subscribe()
+                time.sleep(1)
+                result = run(bench, name, args.sse_requests, 1)
+            else:
+                result = run(bench, name, args.requests, args.warmup)
+            results[name] = result
+            print(f"    {name:<18} {result['throughput_rps']:>9.1f} req/s   "
+                  f"p50 {result['latency_ms']['p50']:>8.3f} ms   p95 {result['latency_ms']['p95']:>8.3f} ms   "
+                  f"p99 {result['latency_ms']['p99']:>8.3f} ms   {result['queries_per_request']['mean']:>5.1f} queries"
+                  + (f"   {result['errors']} errors" if result['errors'] else ''))
+    finally:
+        if keeper is not None:
+            vote_app.live_updates.unsubscribe(keeper)
+        if not args.keep:
+            if not args.fake_redis:
+                remaining = wait_for_queue(redis_client.get_redis_client(), args.drain_timeout)
+                if remaining:
+                    print(f"[!] {remaining} votes still queued after {args.drain_timeout:.0f}s; "
+                          f"the worker will reject them once their competitions are gone")
+            cleanup(conn)
+        conn.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'benchmark': 'endpoints',
+                'dataset': {'users': args.users, 'competitions': args.competitions,
+                            'votes': args.votes, 'favorites_per_user': args.favorites},
+                'redis': 'fakeredis' if args.fake_redis else f'{redis_client.redis_host}:{redis_client.redis_port}',
+                'results': results,
+            }, f, indent=2)
+        print(f"[✓] Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
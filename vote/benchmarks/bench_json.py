@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Benchmark listing rows and JSON serialization: dict rows vs. records.
+
+Builds competition listing rows the way the app does (``RealDictRow`` per
+row as from a ``RealDictCursor``, or ``CompetitionListingRecord`` from tuple
+rows), decorated with tallies, and times serializing them with Flask's JSON
+provider and the orjson provider. Memory is the traced allocation held by
+the built rows.
+
+    python benchmarks/bench_json.py --rows 10000 --output json.json
+
+Needs no database; the orjson rows are skipped when orjson is not installed.
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from psycopg2.extras import RealDictRow
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json_provider  # noqa: E402
+from records import COMPETITION_LISTING_COLUMNS, CompetitionListingRecord  # noqa: E402
+
+
+def tuple_rows(count):
+    """Rows as a plain cursor returns them"""
+    now = datetime(2026, 1, 1, 12, 0, 0)
+    return [
+        (i, f'Competition {i}', f'Description of competition {i} ' * 3, 'Cats', 'Dogs',
+         ['music', 'pets'], f'https://example.com/{i}.png', 'active',
+         now - timedelta(minutes=i), now, False, i % 97, i * 3, i % 500, None)
+        for i in range(1, count + 1)
+    ]
+
+
+def decorate(row, i):
+    # What attach_tallies and the listing add
+    row['votes_a'] = i % 50
+    row['votes_b'] = i % 30
+    row['total_votes'] = row['votes_a'] + row['votes_b']
+    row['percentage_a'] = round(row['votes_a'] / row['total_votes'] * 100, 1) if row['total_votes'] else 0
+    row['percentage_b'] = round(row['votes_b'] / row['total_votes'] * 100, 1) if row['total_votes'] else 0
+    row['is_favorited'] = False
+
+
+def build_dicts(raw):
+    rows = [RealDictRow(zip(COMPETITION_LISTING_COLUMNS, row)) for row in raw]
+    for i, row in enumerate(rows):
+        decorate(row, i)
+    return rows
+
+
+def build_records(raw):
+    rows = [CompetitionListingRecord(*row) for row in raw]
+    for i, row in enumerate(rows):
+        decorate(row, i)
+    return rows
+
+
+BUILDERS = {'dict_rows': build_dicts, 'records': build_records}
+
+
+def measure_build(builder, raw, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        builder(raw)
+        timings.append((time.perf_counter() - started) * 1000)
+    gc.collect()
+    tracemalloc.start()
+    rows = builder(raw)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, round(statistics.median(timings), 3), size
+
+
+def time_dumps(provider, payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = provider.dumps(payload)
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=7, help='runs per measurement; the median is reported')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    providers = {'default': DefaultJSONProvider(app)}
+    if json_provider.orjson is not None:
+        providers['orjson'] = json_provider.OrjsonProvider(app)
+
+    raw = tuple_rows(args.rows)
+    results = {}
+    for name, builder in BUILDERS.items():
+        rows, build_ms, memory = measure_build(builder, raw, args.repeat)
+        payload = {'competitions': rows, 'all_tags': ['music', 'pets'], 'next_cursor': None}
+        result = {'build_ms': build_ms, 'memory_bytes': memory,
+                  'memory_per_row': round(memory / args.rows, 1), 'dumps_ms': {}}
+        for provider_name, provider in providers.items():
+            result['dumps_ms'][provider_name], result['body_bytes'] = time_dumps(provider, payload, args.repeat)
+        results[name] = result
+        print(f"[*] {name:<10} build {build_ms:>9.3f} ms   {result['memory_per_row']:>8.1f} B/row   "
+              + '   '.join(f"{p} {ms:>9.3f} ms" for p, ms in result['dumps_ms'].items()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'json', 'rows': args.rows, 'results': results}, f, indent=2)
+        print(f"[✓] Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
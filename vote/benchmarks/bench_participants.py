@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Benchmark vote insert throughput: COUNT(DISTINCT) vs. incremental participants.
+
+Seeds scratch ``bench_votes``/``bench_competitions_pc`` tables (same keys and
+index as migrations/add_incremental_participants.sql) with existing votes in
+one hot competition at increasing sizes, then times single-row vote inserts
+under the legacy trigger, which recounts distinct voters on every insert,
+and under the incremental trigger, which only probes for the new voter.
+
+    python benchmarks/bench_participants.py --sizes 10000 100000 1000000 --output participants.json
+
+The scratch tables and functions are dropped afterwards unless ``--keep`` is given.
+"""
+import argparse
+import json
+import os
+import time
+import psycopg2
+
+# Database configuration
+db_host = os.getenv('DB_HOST', 'db')
+db_port = int(os.getenv('DB_PORT', 5432))
+db_name = os.getenv('DB_NAME', 'postgres')
+db_user = os.getenv('POSTGRES_USER', 'postgres')
+db_password = os.getenv('POSTGRES_PASSWORD', 'postgres')
+
+connection_string = f"dbname={db_name} user={db_user} password={db_password} host={db_host} port={db_port}"
+
+VOTES = 'bench_votes'
+COMPETITIONS = 'bench_competitions_pc'
+COMPETITION_ID = 1
+
+# The legacy trigger from migrations/add_user_features.sql
+LEGACY_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION bench_participants_legacy() RETURNS TRIGGER AS $$
+    BEGIN
+        UPDATE {COMPETITIONS}
+        SET participant_count = (
+            SELECT COUNT(DISTINCT user_id) FROM {VOTES} WHERE competition_id = NEW.competition_id
+        )
+        WHERE id = NEW.competition_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# The insert path of migrations/add_incremental_participants.sql
+INCREMENTAL_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION bench_participants_incremental() RETURNS TRIGGER AS $$
+    BEGIN
+        UPDATE {COMPETITIONS} c SET participant_count = participant_count + d.added
+        FROM (
+            SELECT g.competition_id, COUNT(*) AS added
+            FROM (
+                SELECT competition_id, user_id, COUNT(*) AS rows_added FROM new_votes
+                WHERE competition_id IS NOT NULL AND user_id IS NOT NULL
+                GROUP BY competition_id, user_id
+            ) g
+            WHERE (SELECT COUNT(*) FROM {VOTES} v
+                   WHERE v.competition_id = g.competition_id AND v.user_id = g.user_id) = g.rows_added
+            GROUP BY g.competition_id
+        ) d
+        WHERE c.id = d.competition_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# Trigger function and how it is attached, per mode
+MODES = {
+    'legacy': ('bench_participants_legacy', 'FOR EACH ROW'),
+    'incremental': ('bench_participants_incremental', 'REFERENCING NEW TABLE AS new_votes FOR EACH STATEMENT'),
+}
+
+INSERT_SQL = f"INSERT INTO {VOTES} (id, competition_id, user_id, vote) VALUES (%s, %s, %s, %s)"
+
+
+def create_tables(cursor):
+    cursor.execute(f"DROP TABLE IF EXISTS {VOTES}")
+    cursor.execute(f"DROP TABLE IF EXISTS {COMPETITIONS}")
+    cursor.execute(f"CREATE TABLE {COMPETITIONS} (id INTEGER PRIMARY KEY, participant_count INTEGER DEFAULT 0)")
+    cursor.execute(f"""
+        CREATE TABLE {VOTES} (
+            id VARCHAR(255) NOT NULL,
+            competition_id INTEGER,
+            user_id INTEGER,
+            vote VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, competition_id)
+        )
+    """)
+    cursor.execute(f"CREATE INDEX {VOTES}_competition_user ON {VOTES}(competition_id, user_id)")
+    cursor.execute(f"INSERT INTO {COMPETITIONS} (id) VALUES (%s)", (COMPETITION_ID,))
+    cursor.execute(LEGACY_FUNCTION)
+    cursor.execute(INCREMENTAL_FUNCTION)
+
+
+def seed(cursor, start, stop):
+    """Insert votes by users start+1..stop without any trigger"""
+    cursor.execute(f"""
+        INSERT INTO {VOTES} (id, competition_id, user_id, vote)
+        SELECT 'user_' || i, %s, i, CASE WHEN i %% 2 = 0 THEN 'a' ELSE 'b' END
+        FROM generate_series(%s + 1, %s) AS i
+    """, (COMPETITION_ID, start, stop))
+
+
+def use_trigger(cursor, function, level):
+    cursor.execute(f"DROP TRIGGER IF EXISTS bench_participants ON {VOTES}")
+    cursor.execute(f"""
+        CREATE TRIGGER bench_participants AFTER INSERT ON {VOTES}
+        {level} EXECUTE FUNCTION {function}()
+    """)
+
+
+def time_inserts(conn, first_user, inserts):
+    """Insert and commit ``inserts`` new voters one at a time, like the
+    worker does, then remove them again; returns inserts per second"""
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    for user_id in range(first_user, first_user + inserts):
+        cursor.execute(INSERT_SQL, (f'user_{user_id}', COMPETITION_ID, user_id, 'a'))
+        conn.commit()
+    elapsed = time.perf_counter() - started
+    cursor.execute(f"DROP TRIGGER IF EXISTS bench_participants ON {VOTES}")
+    cursor.execute(f"DELETE FROM {VOTES} WHERE user_id >= %s", (first_user,))
+    conn.commit()
+    cursor.close()
+    return round(inserts / elapsed, 1)
+
+
+def bench_size(conn, size, inserts):
+    cursor = conn.cursor()
+    cursor.execute(f"ANALYZE {VOTES}")
+    conn.commit()
+
+    result = {'size': size, 'inserts': inserts, 'inserts_per_s': {}}
+    for mode, (function, level) in MODES.items():
+        use_trigger(cursor, function, level)
+        conn.commit()
+        result['inserts_per_s'][mode] = time_inserts(conn, size + 1, inserts)
+    cursor.close()
+    result['speedup'] = round(result['inserts_per_s']['incremental'] / result['inserts_per_s']['legacy'], 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='existing votes in the competition before timing')
+    parser.add_argument('--inserts', type=int, default=200, help='votes inserted and timed per size and mode')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch tables afterwards')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(connection_string)
+    cursor = conn.cursor()
+    create_tables(cursor)
+    conn.commit()
+
+    results = []
+    seeded = 0
+    try:
+        for size in sorted(args.sizes):
+            print(f"[*] Seeding {size} votes...")
+            seed(cursor, seeded, size)
+            conn.commit()
+            seeded = size
+
+            result = bench_size(conn, size, args.inserts)
+            results.append(result)
+            print(f"    legacy {result['inserts_per_s']['legacy']:>10.1f} inserts/s"
+                  f"   incremental {result['inserts_per_s']['incremental']:>10.1f} inserts/s"
+                  f"   ({result['speedup']}x)")
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP TABLE IF EXISTS {VOTES}")
+            cursor.execute(f"DROP TABLE IF EXISTS {COMPETITIONS}")
+            for function, _ in MODES.values():
+                cursor.execute(f"DROP FUNCTION IF EXISTS {function}()")
+            conn.commit()
+        cursor.close()
+        conn.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'participants', 'results': results}, f, indent=2)
+        print(f"[✓] Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
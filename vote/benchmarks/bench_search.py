@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Benchmark competition search: legacy ILIKE scans vs. indexed search.
+
+Seeds a scratch ``bench_competitions`` table (same search columns and
+indexes as migrations/add_search_indexes.sql) at increasing sizes and times
+the legacy ``ILIKE '%q%'`` query without indexes against the shared
+``search.build_search`` query with its GIN indexes in place.
+
+    python benchmarks/bench_search.py --sizes 10000 100000 1000000 --output search.json
+
+The scratch table is dropped afterwards unless ``--keep`` is given.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from search import build_search  # noqa: E402
+
+# Database configuration
+db_host = os.getenv('DB_HOST', 'db')
+db_port = int(os.getenv('DB_PORT', 5432))
+db_name = os.getenv('DB_NAME', 'postgres')
+db_user = os.getenv('POSTGRES_USER', 'postgres')
+db_password = os.getenv('POSTGRES_PASSWORD', 'postgres')
+
+connection_string = f"dbname={db_name} user={db_user} password={db_password} host={db_host} port={db_port}"
+
+TABLE = 'bench_competitions'
+WORDS = ['music', 'sports', 'coffee', 'orchestra', 'python', 'javascript', 'galaxy', 'pizza',
+         'marvel', 'basketball', 'guitar', 'mountain', 'ocean', 'science', 'painting', 'zebra']
+QUERIES = {
+    'common_word': 'music',
+    'rare_word': 'zebra',
+    'substring': 'chest',
+    'phrase': 'coffee pizza',
+}
+
+LEGACY_SQL = f"""
+    SELECT id, name FROM {TABLE}
+    WHERE name ILIKE %s OR description ILIKE %s
+    ORDER BY created_at DESC
+    LIMIT 50
+"""
+
+INDEXES = [
+    f"CREATE INDEX {TABLE}_search_vector ON {TABLE} USING GIN(search_vector)",
+    f"CREATE INDEX {TABLE}_name_trgm ON {TABLE} USING GIN(name gin_trgm_ops)",
+    f"CREATE INDEX {TABLE}_description_trgm ON {TABLE} USING GIN(description gin_trgm_ops)",
+]
+
+
+def create_table(cursor):
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {TABLE} (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(description, '')), 'B')
+            ) STORED
+        )
+    """)
+
+
+def seed(cursor, start, stop):
+    """Insert rows start+1..stop built from a fixed vocabulary"""
+    cursor.execute(f"""
+        INSERT INTO {TABLE} (name, description, created_at)
+        SELECT
+            'Best ' || w[1 + (i * 7) %% %(n)s] || ' vs ' || w[1 + (i * 13) %% %(n)s] || ' #' || i,
+            'Vote for ' || w[1 + (i * 3) %% %(n)s] || ' or ' || w[1 + (i * 11) %% %(n)s]
+                || ' ' || md5(i::text),
+            NOW() - (i || ' seconds')::interval
+        FROM generate_series(%(start)s + 1, %(stop)s) AS i,
+             (SELECT %(words)s::text[] AS w) AS vocab
+    """, {'start': start, 'stop': stop, 'words': WORDS, 'n': len(WORDS)})
+
+
+def time_query(cursor, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def bench_size(conn, size, repeat):
+    cursor = conn.cursor()
+    for name in ('search_vector', 'name_trgm', 'description_trgm'):
+        cursor.execute(f"DROP INDEX IF EXISTS {TABLE}_{name}")
+    cursor.execute(f"ANALYZE {TABLE}")
+
+    result = {'size': size, 'legacy_ms': {}, 'indexed_ms': {}}
+    for label, term in QUERIES.items():
+        pattern = f'%{term}%'
+        result['legacy_ms'][label] = time_query(cursor, LEGACY_SQL, (pattern, pattern), repeat)
+
+    started = time.perf_counter()
+    for statement in INDEXES:
+        cursor.execute(statement)
+    cursor.execute(f"ANALYZE {TABLE}")
+    result['index_build_s'] = round(time.perf_counter() - started, 2)
+
+    for label, term in QUERIES.items():
+        search_filter = build_search(term)
+        sql = f"""
+            SELECT id, name FROM {TABLE}
+            WHERE {search_filter.where}
+            ORDER BY {search_filter.rank} DESC, created_at DESC
+            LIMIT 50
+        """
+        result['indexed_ms'][label] = time_query(
+            cursor, sql, search_filter.where_params + search_filter.rank_params, repeat)
+
+    conn.commit()
+    cursor.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5, help='runs per query; the median is reported')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--keep', action='store_true', help=f'keep the {TABLE} table afterwards')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(connection_string)
+    cursor = conn.cursor()
+    create_table(cursor)
+    conn.commit()
+
+    results = []
+    seeded = 0
+    try:
+        for size in sorted(args.sizes):
+            print(f"[*] Seeding {size} competitions...")
+            seed(cursor, seeded, size)
+            conn.commit()
+            seeded = size
+
+            result = bench_size(conn, size, args.repeat)
+            results.append(result)
+            for label in QUERIES:
+                print(f"    {label:<12} legacy {result['legacy_ms'][label]:>10.3f} ms"
+                      f"   indexed {result['indexed_ms'][label]:>10.3f} ms")
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            conn.commit()
+        cursor.close()
+        conn.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'search', 'results': results}, f, indent=2)
+        print(f"[✓] Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
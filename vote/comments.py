@@ -0,0 +1,135 @@
+"""Threaded comment retrieval for competitions.
+
+Top-level comments are paged newest first with keyset cursors. Each page
+comes back as trees: every comment nests up to ``COMMENT_REPLIES_PREVIEW`` of
+its oldest replies, ``COMMENT_REPLY_DEPTH`` levels deep, fetched with one
+query per level. Every comment carries its ``reply_count``; one with replies
+left out sets ``has_more_replies`` and the ``replies_cursor`` to pass to the
+replies endpoint, which pages the rest (as trees of their own) oldest first.
+"""
+import os
+from pagination import SortKey, apply_keyset, encode_cursor, paginate
+
+COMMENTS_PAGE_SIZE = int(os.getenv('COMMENTS_PAGE_SIZE', 20))
+COMMENT_REPLY_DEPTH = int(os.getenv('COMMENT_REPLY_DEPTH', 2))
+COMMENT_REPLIES_PREVIEW = int(os.getenv('COMMENT_REPLIES_PREVIEW', 3))
+
+THREAD_SORT_KEYS = [SortKey('cc.created_at', 'created_at', True, 'timestamp'),
+                    SortKey('cc.id', 'id', True, 'integer')]
+REPLY_SORT_KEYS = [SortKey('cc.created_at', 'created_at', False, 'timestamp'),
+                   SortKey('cc.id', 'id', False, 'integer')]
+
+COMMENT_COLUMNS = """
+    cc.id, cc.comment_text, cc.parent_id, cc.likes_count,
+    cc.created_at, cc.updated_at,
+    u.username, u.id AS user_id
+"""
+
+
+def load_threads(cursor, competition_id, token, limit):
+    """One page of top-level comments with nested replies; returns
+    (threads, next_cursor). ``cursor`` must be a RealDictCursor."""
+    sql, params = apply_keyset(f"""
+        SELECT {COMMENT_COLUMNS}
+        FROM competition_comments cc
+        JOIN users u ON cc.user_id = u.id
+        WHERE cc.competition_id = %s AND cc.parent_id IS NULL AND cc.deleted_at IS NULL
+    """, [competition_id], THREAD_SORT_KEYS, 'threads', token, limit)
+    cursor.execute(sql, params)
+    threads, next_cursor = paginate(cursor.fetchall(), limit, 'threads', THREAD_SORT_KEYS)
+    attach_replies(cursor, threads)
+    return threads, next_cursor
+
+
+def load_replies(cursor, competition_id, parent_id, token, limit):
+    """One page of the replies to ``parent_id``, oldest first, with their
+    own replies nested; returns (replies, next_cursor)"""
+    sql, params = apply_keyset(f"""
+        SELECT {COMMENT_COLUMNS}
+        FROM competition_comments cc
+        JOIN users u ON cc.user_id = u.id
+        WHERE cc.competition_id = %s AND cc.parent_id = %s AND cc.deleted_at IS NULL
+    """, [competition_id, parent_id], REPLY_SORT_KEYS, 'replies', token, limit)
+    cursor.execute(sql, params)
+    replies, next_cursor = paginate(cursor.fetchall(), limit, 'replies', REPLY_SORT_KEYS)
+    attach_replies(cursor, replies)
+    return replies, next_cursor
+
+
+def attach_replies(cursor, comments, depth=COMMENT_REPLY_DEPTH, preview=COMMENT_REPLIES_PREVIEW):
+    """Nest up to ``preview`` replies per comment, ``depth`` levels below
+    ``comments``, and mark comments with replies left to load"""
+    level = comments
+    for current_depth in range(depth + 1):
+        if not level:
+            break
+        by_id = {}
+        for comment in level:
+            comment['replies'] = []
+            comment['reply_count'] = 0
+            by_id[comment['id']] = comment
+
+        if current_depth == depth:
+            # Below the nesting limit only the number of replies is needed
+            cursor.execute("""
+                SELECT parent_id, COUNT(*) AS replies
+                FROM competition_comments
+                WHERE parent_id = ANY(%s) AND deleted_at IS NULL
+                GROUP BY parent_id
+            """, (list(by_id),))
+            for row in cursor.fetchall():
+                by_id[row['parent_id']]['reply_count'] = row['replies']
+            break
+
+        cursor.execute(f"""
+            SELECT * FROM (
+                SELECT {COMMENT_COLUMNS},
+                       ROW_NUMBER() OVER (PARTITION BY cc.parent_id ORDER BY cc.created_at, cc.id) AS position,
+                       COUNT(*) OVER (PARTITION BY cc.parent_id) AS siblings
+                FROM competition_comments cc
+                JOIN users u ON cc.user_id = u.id
+                WHERE cc.parent_id = ANY(%s) AND cc.deleted_at IS NULL
+            ) AS replies
+            WHERE position <= %s
+            ORDER BY parent_id, position
+        """, (list(by_id), preview))
+        next_level = []
+        for row in cursor.fetchall():
+            row.pop('position')
+            parent = by_id[row['parent_id']]
+            parent['reply_count'] = row.pop('siblings')
+            parent['replies'].append(row)
+            next_level.append(row)
+        _mark_more_replies(level)
+        level = next_level
+    _mark_more_replies(level)
+
+
+def _mark_more_replies(comments):
+    for comment in comments:
+        nested = comment['replies']
+        comment['has_more_replies'] = comment['reply_count'] > len(nested)
+        # The replies endpoint continues after the last nested reply, or
+        # starts from the first one without a cursor
+        comment['replies_cursor'] = (encode_cursor('replies', REPLY_SORT_KEYS, nested[-1])
+                                     if comment['has_more_replies'] and nested else None)
+
+
+def comment_ids(comments):
+    """Ids of every comment in a list of trees"""
+    ids = []
+    stack = list(comments)
+    while stack:
+        comment = stack.pop()
+        ids.append(comment['id'])
+        stack.extend(comment.get('replies', ()))
+    return ids
+
+
+def mark_liked(comments, liked_ids):
+    """Set ``is_liked`` on every comment in a list of trees"""
+    stack = list(comments)
+    while stack:
+        comment = stack.pop()
+        comment['is_liked'] = comment['id'] in liked_ids
+        stack.extend(comment.get('replies', ()))
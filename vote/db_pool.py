@@ -0,0 +1,225 @@
+"""Bounded PostgreSQL connection pool for the voting app"""
+import os
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions
+
+POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+POOL_VALIDATE_AFTER = float(os.getenv('DB_POOL_VALIDATE_AFTER', 30))
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Raised when no connection becomes available within the checkout timeout"""
+    pass
+
+
+class _PooledConnection:
+    """Bookkeeping wrapper around a raw psycopg2 connection"""
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """Thread-safe, bounded pool of psycopg2 connections.
+
+    Idle connections are validated with a cheap round trip once they have sat
+    unused for ``validate_after`` seconds, and connections older than
+    ``max_lifetime`` are closed instead of being reused.
+    """
+
+    def __init__(self, dsn, max_size=POOL_MAX_SIZE,
+                 timeout=POOL_TIMEOUT, max_lifetime=POOL_MAX_LIFETIME,
+                 validate_after=POOL_VALIDATE_AFTER, connection_factory=None):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.validate_after = validate_after
+        self.connection_factory = connection_factory
+        self._idle = []
+        self._in_use = {}
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+        # Counters are also updated outside the pool condition (connects,
+        # validation, discards), so they get their own lock
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'connections_created': 0,
+            'connections_closed': 0,
+            'checkouts': 0,
+            'checkout_timeouts': 0,
+            'validation_failures': 0,
+            'recycled': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def _connect(self):
+        if self.connection_factory is not None:
+            conn = psycopg2.connect(self.dsn, connection_factory=self.connection_factory)
+        else:
+            conn = psycopg2.connect(self.dsn)
+        self._count('connections_created')
+        return _PooledConnection(conn)
+
+    def _count(self, stat):
+        with self._stats_lock:
+            self._stats[stat] += 1
+
+    def _discard(self, entry):
+        self._count('connections_closed')
+        try:
+            entry.conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _is_expired(self, entry, now):
+        return self.max_lifetime > 0 and now - entry.created_at > self.max_lifetime
+
+    def _is_healthy(self, entry, now):
+        if entry.conn.closed:
+            return False
+        if now - entry.last_used < self.validate_after:
+            return True
+        try:
+            cursor = entry.conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            entry.conn.rollback()
+            return True
+        except psycopg2.Error:
+            self._count('validation_failures')
+            return False
+
+    def _reset_after_fork(self):
+        # Connections inherited from a parent process must never be shared.
+        self._idle = []
+        self._in_use = {}
+        self._cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def getconn(self):
+        """Check out a connection, blocking up to ``timeout`` seconds"""
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+
+        started = time.monotonic()
+        waited = False
+        entry = None
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._idle:
+                    entry = self._idle.pop()
+                elif len(self._in_use) >= self.max_size:
+                    remaining = self.timeout - (now - started)
+                    if remaining <= 0:
+                        self._count('checkout_timeouts')
+                        raise PoolTimeout(f"Timed out after {self.timeout}s waiting for a database connection")
+                    waited = True
+                    self._cond.wait(remaining)
+                    continue
+                # Reserve the slot, then validate or connect without the lock
+                # so other checkouts are not serialized behind a round trip.
+                reservation = object()
+                self._in_use[id(reservation)] = None
+                break
+
+        try:
+            if entry is not None and self._is_expired(entry, now):
+                self._count('recycled')
+                self._discard(entry)
+                entry = None
+            elif entry is not None and not self._is_healthy(entry, now):
+                self._discard(entry)
+                entry = None
+            if entry is None:
+                entry = self._connect()
+        except BaseException:
+            with self._cond:
+                del self._in_use[id(reservation)]
+                self._cond.notify()
+            raise
+
+        # Swap the reservation for the connection in one step so the slot is
+        # never free in between
+        with self._cond:
+            del self._in_use[id(reservation)]
+            return self._checkout(entry, started, waited)
+
+    def _checkout(self, entry, started, waited):
+        self._in_use[id(entry.conn)] = entry
+        with self._stats_lock:
+            self._stats['checkouts'] += 1
+            if waited:
+                wait_time = time.monotonic() - started
+                self._stats['waits'] += 1
+                self._stats['wait_time_total'] += wait_time
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+        return entry.conn
+
+    def putconn(self, conn, close=False):
+        """Return a connection to the pool, rolling back any open transaction"""
+        with self._cond:
+            entry = self._in_use.get(id(conn))
+        if entry is None:
+            # Not ours (e.g. checked out before a fork); just drop it.
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+            return
+
+        # Roll back without the lock; the connection keeps its slot meanwhile
+        # so the pool never holds more than max_size connections
+        if not close and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+
+        now = time.monotonic()
+        discard = close or conn.closed or self._is_expired(entry, now)
+        if discard:
+            self._discard(entry)
+        with self._cond:
+            del self._in_use[id(conn)]
+            if not discard:
+                entry.last_used = now
+                self._idle.append(entry)
+            self._cond.notify()
+
+    def closeall(self):
+        """Close every idle connection held by the pool"""
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop())
+
+    def stats(self):
+        """Snapshot of pool usage and wait statistics"""
+        with self._cond:
+            in_use = sum(1 for entry in self._in_use.values() if entry is not None)
+            with self._stats_lock:
+                snapshot = dict(self._stats)
+            snapshot.update({
+                'max_size': self.max_size,
+                'in_use': in_use,
+                'idle': len(self._idle),
+                'connecting': len(self._in_use) - in_use,
+            })
+        if snapshot['waits']:
+            snapshot['wait_time_avg'] = snapshot['wait_time_total'] / snapshot['waits']
+        else:
+            snapshot['wait_time_avg'] = 0.0
+        return snapshot
@@ -0,0 +1,85 @@
+"""Conditional GET and response compression for the vote app.
+
+JSON API responses get a weak ETag hashed from the body, so a client that
+polls with ``If-None-Match`` gets an empty 304 while nothing changed. The
+body already reflects everything a listing depends on (competition edits,
+tallies, the caller's favorites and likes), and the hot listings are served
+from the response cache, so hashing it is cheaper and more exact than
+deriving a validator from ``updated_at`` columns. ETags are weak so the same
+validator holds for every content encoding.
+
+Bodies of at least ``COMPRESSION_MIN_SIZE`` bytes with a compressible type
+are compressed with brotli (when the optional ``brotli`` package is installed
+and the client accepts it) or gzip. Streamed and passthrough responses (SSE,
+static files) are left alone.
+"""
+import gzip
+import hashlib
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+
+COMPRESSIBLE_TYPES = {'application/json', 'text/html', 'text/css', 'text/plain',
+                      'text/javascript', 'application/javascript'}
+
+
+def _is_buffered(response):
+    return not response.is_streamed and not response.direct_passthrough
+
+
+def add_etag(request, response):
+    """Tag a successful JSON GET response and turn it into a 304 when the
+    client already has it"""
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+        return response
+    if response.mimetype != 'application/json' or not _is_buffered(response):
+        return response
+    digest = hashlib.sha1(response.get_data()).hexdigest()
+    response.set_etag(digest, weak=True)
+    # Responses may be per user: browsers revalidate, shared caches don't store
+    if 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+def _choose_encoding(accept_encoding):
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(request, response):
+    """Compress a buffered response body the client accepts compressed"""
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if response.mimetype not in COMPRESSIBLE_TYPES or not _is_buffered(response):
+        return response
+    if 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_SIZE:
+        return response
+    encoding = _choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if len(compressed) >= len(body):
+        return response
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Batch vote ingestion worker.
+
+Drains the vote queue written by ``app.vote()`` in batches (see
+``vote_transport`` for the list and stream modes): the first vote is awaited
+with a blocking read, the rest are collected until the batch is full or the
+flush interval elapses, votes are de-duplicated per (voter, competition)
+keeping the latest, and the batch is upserted with a single
+``execute_values`` statement. A batch rejected for its data (say a vote for a
+deleted competition) is bisected until the offending rows are isolated; those
+are logged, pushed to the ``votes:dead-letter`` list and dropped, and the rest
+is written. Throughput is logged periodically.
+
+    python ingest_worker.py
+
+In list mode run it instead of (not alongside) the .NET worker; in stream
+mode any number of copies can run side by side.
+"""
+import json
+import logging
+import os
+import signal
+import time
+import psycopg2
+from psycopg2.extras import execute_values
+from redis.exceptions import RedisError
+from redis_client import get_redis_client
+from vote_transport import VOTE_TRANSPORT, get_consumer
+
+# Database configuration
+db_host = os.getenv('DB_HOST', 'db')
+db_port = int(os.getenv('DB_PORT', 5432))
+db_name = os.getenv('DB_NAME', 'postgres')
+db_user = os.getenv('POSTGRES_USER', 'postgres')
+db_password = os.getenv('POSTGRES_PASSWORD', 'postgres')
+
+connection_string = f"dbname={db_name} user={db_user} password={db_password} host={db_host} port={db_port}"
+
+BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 500))
+FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', 0.2))
+REPORT_INTERVAL = float(os.getenv('INGEST_REPORT_INTERVAL', 10))
+RETRY_DELAY = 1
+DEAD_LETTER_KEY = 'votes:dead-letter'
+DEAD_LETTER_MAXLEN = 10000
+# Errors caused by a row's values rather than by the connection or server;
+# anything else retries the whole batch
+ROW_ERRORS = (psycopg2.IntegrityError, psycopg2.DataError)
+
+UPSERT_SQL = """
+    INSERT INTO votes (id, competition_id, user_id, vote) VALUES %s
+    ON CONFLICT (id, competition_id) DO UPDATE
+    SET vote = EXCLUDED.vote, user_id = EXCLUDED.user_id
+    WHERE votes.vote IS DISTINCT FROM EXCLUDED.vote
+"""
+
+logging.basicConfig(level=os.getenv('WORKER_LOG_LEVEL', 'info').upper(),
+                    format='%(asctime)s %(levelname)s %(message)s')
+logger = logging.getLogger('ingest_worker')
+
+
+class ThroughputReport:
+    """Running counters, logged every ``interval`` seconds"""
+
+    def __init__(self, interval=REPORT_INTERVAL):
+        self.interval = interval
+        self.started = self.window_started = time.monotonic()
+        self.totals = {'received': 0, 'written': 0, 'duplicates': 0, 'malformed': 0,
+                       'rejected': 0, 'batches': 0, 'flush_time': 0.0}
+        self.window = dict(self.totals)
+
+    def record(self, received, written, duplicates, malformed, rejected, flush_time):
+        for counters in (self.totals, self.window):
+            counters['received'] += received
+            counters['written'] += written
+            counters['duplicates'] += duplicates
+            counters['malformed'] += malformed
+            counters['rejected'] += rejected
+            counters['batches'] += 1
+            counters['flush_time'] += flush_time
+
+    def maybe_log(self):
+        now = time.monotonic()
+        if now - self.window_started >= self.interval:
+            self._log(self.window, now - self.window_started, 'last')
+            self.window = dict.fromkeys(self.window, 0)
+            self.window_started = now
+
+    def log_summary(self):
+        self._log(self.totals, time.monotonic() - self.started, 'total')
+
+    @staticmethod
+    def _log(counters, elapsed, label):
+        batches = counters['batches'] or 1
+        logger.info(
+            "%s %.1fs: %d votes received (%.1f/s), %d rows written, %d duplicates folded, "
+            "%d malformed, %d rejected, %d batches (avg %.1f votes, %.2f ms per flush)",
+            label, elapsed, counters['received'], counters['received'] / max(elapsed, 1e-9),
+            counters['written'], counters['duplicates'], counters['malformed'], counters['rejected'],
+            counters['batches'], counters['received'] / batches,
+            counters['flush_time'] * 1000 / batches)
+
+
+def open_db_connection():
+    """Connect to Postgres, retrying until it is available"""
+    while True:
+        try:
+            conn = psycopg2.connect(connection_string)
+            logger.info("Connected to db")
+            return conn
+        except psycopg2.OperationalError:
+            logger.warning("Waiting for db")
+            time.sleep(RETRY_DELAY)
+
+
+def fold_batch(items):
+    """Parse raw queue items into upsert rows, keeping the last vote per
+    (voter, competition); returns (rows, duplicates, malformed)"""
+    latest = {}
+    malformed = 0
+    for raw in items:
+        try:
+            vote = json.loads(raw)
+            key = (vote['voter_id'], int(vote['competition_id']))
+            row = (vote['voter_id'], int(vote['competition_id']), vote.get('user_id'), vote['vote'])
+        except (ValueError, KeyError, TypeError):
+            malformed += 1
+            logger.warning("Dropping malformed vote: %r", raw)
+            continue
+        # Re-insert so dict order follows the most recent vote
+        latest.pop(key, None)
+        latest[key] = row
+    rows = list(latest.values())
+    return rows, len(items) - malformed - len(rows), malformed
+
+
+def write_batch(conn, rows):
+    """Upsert one batch in a single statement and transaction"""
+    cursor = conn.cursor()
+    try:
+        execute_values(cursor, UPSERT_SQL, rows, page_size=len(rows))
+        written = cursor.rowcount
+        conn.commit()
+        return written
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def write_isolating(conn, rows):
+    """Write ``rows``, bisecting a batch that fails on a row's data until
+    the failing rows are isolated; returns (written, [(row, error)]).
+
+    Halves commit separately, which is safe because the upsert is idempotent.
+    """
+    try:
+        return write_batch(conn, rows), []
+    except ROW_ERRORS as e:
+        if len(rows) == 1:
+            return 0, [(rows[0], e)]
+    middle = len(rows) // 2
+    written_head, rejected_head = write_isolating(conn, rows[:middle])
+    written_tail, rejected_tail = write_isolating(conn, rows[middle:])
+    return written_head + written_tail, rejected_head + rejected_tail
+
+
+def dead_letter(redis, rejected):
+    """Log rejected rows and keep them on the dead-letter list for inspection"""
+    entries = []
+    for (voter_id, competition_id, user_id, vote), error in rejected:
+        logger.error("Dropping vote of %s in competition %s: %s", voter_id, competition_id,
+                     str(error).strip())
+        entries.append(json.dumps({'voter_id': voter_id, 'competition_id': competition_id,
+                                   'user_id': user_id, 'vote': vote, 'error': str(error).strip()}))
+    try:
+        pipe = redis.pipeline(transaction=False)
+        pipe.rpush(DEAD_LETTER_KEY, *entries)
+        pipe.ltrim(DEAD_LETTER_KEY, -DEAD_LETTER_MAXLEN, -1)
+        pipe.execute()
+    except RedisError as e:
+        logger.error("Could not dead-letter %d votes: %s", len(entries), e)
+
+
+def run():
+    """Main ingest loop"""
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+
+    redis = get_redis_client()
+    conn = open_db_connection()
+    consumer = None
+    report = ThroughputReport()
+    logger.info("Ingesting votes from the %s transport in batches of up to %d (flush interval %.3fs)",
+                VOTE_TRANSPORT, BATCH_SIZE, FLUSH_INTERVAL)
+
+    while not stopping:
+        try:
+            if consumer is None:
+                consumer = get_consumer(redis)
+            items = consumer.read_batch(BATCH_SIZE, FLUSH_INTERVAL)
+        except RedisError as e:
+            logger.warning("Redis unavailable: %s", e)
+            time.sleep(RETRY_DELAY)
+            continue
+
+        if items:
+            rows, duplicates, malformed = fold_batch(items)
+            started = time.monotonic()
+            try:
+                written, rejected = write_isolating(conn, rows) if rows else (0, [])
+            except psycopg2.Error as e:
+                logger.error("Batch of %d votes failed, retrying: %s", len(items), e)
+                try:
+                    consumer.retry()
+                except RedisError as redis_error:
+                    logger.error("Could not requeue batch: %s", redis_error)
+                if conn.closed:
+                    conn = open_db_connection()
+                else:
+                    time.sleep(RETRY_DELAY)
+                continue
+            if rejected:
+                dead_letter(redis, rejected)
+            report.record(len(items), written, duplicates, malformed, len(rejected),
+                          time.monotonic() - started)
+
+        try:
+            consumer.ack()
+        except RedisError as e:
+            # Stream entries stay pending and are re-read; the upsert is idempotent
+            logger.warning("Could not acknowledge batch: %s", e)
+        report.maybe_log()
+
+    report.log_summary()
+    conn.close()
+
+
+if __name__ == '__main__':
+    run()
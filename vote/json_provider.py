@@ -0,0 +1,85 @@
+"""orjson-backed JSON provider for the vote app.
+
+``JSON_PROVIDER=auto`` (the default) serializes with orjson when it is
+installed and falls back to Flask's provider otherwise; ``orjson`` requires
+it and ``default`` always uses Flask's. The output matches Flask's provider:
+datetimes and dates are HTTP dates, Decimals are strings and keys of plain
+dicts (including ``RealDictRow``) are sorted. Dataclass records (see
+``records.py``) are serialized natively in field order.
+"""
+import os
+from decimal import Decimal
+from datetime import date, datetime, timezone
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'auto')
+
+if JSON_PROVIDER not in ('auto', 'orjson', 'default'):
+    raise ValueError(f"JSON_PROVIDER must be 'auto', 'orjson' or 'default', not {JSON_PROVIDER!r}")
+if JSON_PROVIDER == 'orjson' and orjson is None:
+    raise ImportError("JSON_PROVIDER=orjson requires the orjson package")
+
+
+_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def _http_date(value):
+    """werkzeug.http.http_date without its email.utils round trip, which
+    dominates serializing rows with timestamps"""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        hour, minute, second = value.hour, value.minute, value.second
+    else:
+        hour = minute = second = 0
+    return (f'{_WEEKDAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} '
+            f'{hour:02d}:{minute:02d}:{second:02d} GMT')
+
+
+def _default(obj):
+    # Only called for what orjson does not handle itself; same formats as
+    # Flask's provider
+    if isinstance(obj, date):
+        return _http_date(obj)
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes with orjson"""
+
+    def _options(self, indent=False):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self._options(bool(kwargs.get('indent')))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=_default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def make_provider(app):
+    """The JSON provider selected by JSON_PROVIDER for ``app``"""
+    if JSON_PROVIDER == 'default' or orjson is None:
+        return DefaultJSONProvider(app)
+    return OrjsonProvider(app)
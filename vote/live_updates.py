@@ -0,0 +1,313 @@
+"""Per-process fan-out of Redis pub/sub messages to SSE clients.
+
+One background thread holds the only subscription for this worker process
+and hands each message, decoded once, to the bounded queue of every client
+watching it. Clients either watch everything (the aggregate channel) or a set
+of competitions (``<channel>:<id>`` channels), and the thread subscribes to
+exactly the channels some connected client needs.
+
+Updates are coalesced per competition into fixed ``SSE_COALESCE_MS`` windows
+before fan-out: each window emits at most one frame per competition and
+channel, carrying the latest counts and the summed delta, serialized once for
+all clients. A client that falls behind never blocks the others: a newer
+frame for the same competition replaces the one still waiting in its queue,
+and once the queue is full the oldest pending frame is dropped.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from redis_client import get_pubsub_client
+
+SSE_CLIENT_QUEUE_SIZE = int(os.getenv('SSE_CLIENT_QUEUE_SIZE', 100))
+# 0 disables coalescing and forwards every message as it arrives
+SSE_COALESCE_MS = int(os.getenv('SSE_COALESCE_MS', 250))
+# Idle SSE connections get a heartbeat event this often, which keeps proxies
+# from timing them out and lets the server notice closed connections
+SSE_HEARTBEAT_SECONDS = int(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+SSE_MAX_WATCHED_COMPETITIONS = 50
+RECONNECT_DELAY = 1
+# How long the subscriber waits for a message before applying channel changes
+POLL_INTERVAL = 0.2
+
+logger = logging.getLogger(__name__)
+
+
+def competition_channel(channel, competition_id):
+    """Name of the per-competition channel under ``channel``"""
+    return f'{channel}:{competition_id}'
+
+
+def parse_competition_ids(values, maximum=SSE_MAX_WATCHED_COMPETITIONS):
+    """Competition ids from ``competition_id`` query values (repeated or
+    comma-separated); raises ValueError for bad input"""
+    competition_ids = set()
+    for part in ','.join(values).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if not part.isdigit():
+            raise ValueError(f'Invalid competition id: {part}')
+        competition_ids.add(int(part))
+    if len(competition_ids) > maximum:
+        raise ValueError(f'At most {maximum} competitions can be watched')
+    return sorted(competition_ids)
+
+
+def connected_frame(competition_ids):
+    return f"data: {json.dumps({'type': 'connected', 'competition_ids': competition_ids})}\n\n"
+
+
+def heartbeat_frame():
+    # A named event, so onmessage handlers never see it
+    return f"event: heartbeat\ndata: {json.dumps({'timestamp': str(datetime.now())})}\n\n"
+
+
+def data_frames(messages):
+    """All pending messages as one chunk, so they go out in a single write"""
+    return ''.join(f"data: {data}\n\n" for data in messages)
+
+
+def merge_updates(current, update):
+    """Fold ``update`` into ``current``, the pending update for the same
+    competition: latest counts win and deltas add up"""
+    merged = dict(update)
+    if 'delta' in current and 'delta' in update:
+        merged['delta'] = {option: current['delta'].get(option, 0) + update['delta'].get(option, 0)
+                           for option in sorted(set(current['delta']) | set(update['delta']))}
+    else:
+        # One side had no delta (an unseeded board), so no sum is exact
+        merged.pop('delta', None)
+    merged['events'] = current.get('events', 1) + update.get('events', 1)
+    return merged
+
+
+class CoalescingQueue:
+    """Bounded queue of messages for one client where a newer message with
+    the same key replaces the one still waiting"""
+
+    def __init__(self, channels, maxsize=SSE_CLIENT_QUEUE_SIZE):
+        self.channels = frozenset(channels)
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.coalesced = 0
+        self._pending = OrderedDict()
+        self._sequence = 0
+
+    def _enqueue(self, key, data):
+        # Vote updates carry absolute counts, so replacing one only loses
+        # the superseded delta
+        if key is not None and key in self._pending:
+            self._pending[key] = data
+            self.coalesced += 1
+            return
+        if len(self._pending) >= self.maxsize:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+        if key is None:
+            self._sequence += 1
+            key = ('seq', self._sequence)
+        self._pending[key] = data
+
+    def _drain(self):
+        messages = list(self._pending.values())
+        self._pending.clear()
+        return messages
+
+
+class Subscription(CoalescingQueue):
+    """Queue for one client served by a worker thread"""
+
+    def __init__(self, channels, maxsize=SSE_CLIENT_QUEUE_SIZE):
+        super().__init__(channels, maxsize)
+        self._ready = threading.Condition()
+
+    def push(self, key, data):
+        with self._ready:
+            self._enqueue(key, data)
+            self._ready.notify()
+
+    def get(self, timeout=None):
+        """Return all pending messages, oldest first, waiting up to
+        ``timeout`` seconds for the first; an empty list on timeout"""
+        with self._ready:
+            if not self._pending and not self._ready.wait_for(lambda: self._pending, timeout):
+                return []
+            return self._drain()
+
+
+class UpdateRouter:
+    """Routes messages from ``channel`` and its per-competition channels to
+    client queues, coalescing vote updates per window.
+
+    Only the subscriber loop calls :meth:`publish_local` and :meth:`flush`;
+    client registration may happen from other threads.
+    """
+
+    subscription_class = Subscription
+
+    def __init__(self, channel):
+        self.channel = channel
+        self._lock = threading.Lock()
+        self._by_channel = {}
+        self._wanted = Counter()
+        self._window = OrderedDict()
+        self._window_started = None
+        self._stats = {'messages': 0, 'frames': 0, 'reconnects': 0, 'dropped': 0, 'coalesced': 0}
+
+    def subscribe(self, competition_ids=None):
+        """Register a client for every update, or only for ``competition_ids``"""
+        if competition_ids:
+            channels = [competition_channel(self.channel, cid) for cid in competition_ids]
+        else:
+            channels = [self.channel]
+        subscription = self.subscription_class(channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._by_channel.setdefault(channel, set()).add(subscription)
+                self._wanted[channel] += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._by_channel.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_channel[channel]
+                self._wanted[channel] -= 1
+                if self._wanted[channel] <= 0:
+                    del self._wanted[channel]
+            self._stats['dropped'] += subscription.dropped
+            self._stats['coalesced'] += subscription.coalesced
+
+    def wanted_channels(self):
+        """Channels some connected client is watching"""
+        with self._lock:
+            return set(self._wanted)
+
+    def publish_local(self, channel, data):
+        """Handle a raw message received on ``channel``: vote updates are held
+        for the current coalescing window, anything else is sent straight on"""
+        try:
+            update = json.loads(data)
+            competition_id = update.get('competition_id')
+        except (ValueError, AttributeError):
+            update = competition_id = None
+        with self._lock:
+            self._stats['messages'] += 1
+        if competition_id is None or SSE_COALESCE_MS <= 0:
+            self._fan_out(channel, competition_id, data)
+            return
+        key = (channel, competition_id)
+        if key in self._window:
+            self._window[key] = merge_updates(self._window[key], update)
+        else:
+            self._window[key] = update
+        if self._window_started is None:
+            self._window_started = time.monotonic()
+
+    def flush(self, force=False):
+        """Send one frame per competition held in a window that has closed"""
+        if self._window_started is None:
+            return
+        if not force and time.monotonic() - self._window_started < SSE_COALESCE_MS / 1000:
+            return
+        window, self._window = self._window, OrderedDict()
+        self._window_started = None
+        for (channel, competition_id), update in window.items():
+            self._fan_out(channel, competition_id, json.dumps(update))
+
+    def _fan_out(self, channel, key, data):
+        with self._lock:
+            self._stats['frames'] += 1
+            subscriptions = list(self._by_channel.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.push(key, data)
+
+    def poll_timeout(self):
+        """How long the subscriber may block before the next flush is due"""
+        if self._window_started is None:
+            return POLL_INTERVAL
+        remaining = self._window_started + SSE_COALESCE_MS / 1000 - time.monotonic()
+        return min(POLL_INTERVAL, max(remaining, 0))
+
+    def count_reconnect(self):
+        with self._lock:
+            self._stats['reconnects'] += 1
+
+    def stats(self):
+        """Connected-client gauge and fan-out counters"""
+        with self._lock:
+            snapshot = dict(self._stats)
+            subscriptions = set().union(*self._by_channel.values()) if self._by_channel else set()
+            snapshot['channels'] = len(self._wanted)
+        snapshot['clients'] = len(subscriptions)
+        for subscription in subscriptions:
+            snapshot['dropped'] += subscription.dropped
+            snapshot['coalesced'] += subscription.coalesced
+        snapshot['queue_size'] = SSE_CLIENT_QUEUE_SIZE
+        snapshot['coalesce_ms'] = SSE_COALESCE_MS
+        return snapshot
+
+
+class LiveUpdates(UpdateRouter):
+    """Single shared subscriber thread for this worker process"""
+
+    def __init__(self, channel):
+        super().__init__(channel)
+        self._thread = None
+        self._pid = None
+
+    def subscribe(self, competition_ids=None):
+        """Register a client and make sure the subscriber thread is running"""
+        subscription = super().subscribe(competition_ids)
+        with self._lock:
+            # Threads do not survive a fork, so start one per worker process
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name=f'live-updates-{self.channel}',
+                                                daemon=True)
+                self._thread.start()
+        return subscription
+
+    def _sync_channels(self, pubsub, subscribed):
+        """Subscribe to newly watched channels and drop unwatched ones"""
+        wanted = self.wanted_channels()
+        added = wanted - subscribed
+        removed = subscribed - wanted
+        if added:
+            pubsub.subscribe(*added)
+        if removed:
+            pubsub.unsubscribe(*removed)
+        return wanted
+
+    def _run(self):
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_pubsub_client().pubsub(ignore_subscribe_messages=True)
+                subscribed = set()
+                while True:
+                    subscribed = self._sync_channels(pubsub, subscribed)
+                    if not subscribed:
+                        self.flush(force=True)
+                        time.sleep(POLL_INTERVAL)
+                        continue
+                    message = pubsub.get_message(timeout=self.poll_timeout())
+                    if message and message['type'] == 'message':
+                        self.publish_local(message['channel'].decode('utf-8'),
+                                           message['data'].decode('utf-8'))
+                    self.flush()
+            except Exception as e:
+                logger.error(f"Live update subscriber for {self.channel} failed: {e}")
+                self.flush(force=True)
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+            self.count_reconnect()
+            time.sleep(RECONNECT_DELAY)
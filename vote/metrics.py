@@ -0,0 +1,349 @@
+"""Prometheus metrics for the vote app.
+
+Every request records its latency (a histogram per route and method), its
+status code, and how many SQL statements and Redis commands it ran and for
+how long. SQL is timed by the cursors of ``InstrumentedConnection`` (the
+pool's connection factory) and Redis by ``InstrumentedRedis`` (the shared
+client); both add to a thread-local tally that is only kept while a request
+is being handled, so background threads cost a timer call and nothing else.
+Pool utilization and SSE client counts are sampled when metrics are
+collected.
+
+Metrics live in each gunicorn worker process. Every worker publishes a
+snapshot to Redis every ``METRICS_PUBLISH_INTERVAL`` seconds and lists its
+key in a per-host sorted set scored by expiry time, and ``/metrics`` sums the
+snapshots of all live workers listed there, so any worker can answer a scrape
+without scanning the keyspace. A worker that exits drops out once its
+snapshot expires, which Prometheus sees as a counter reset. ``METRICS_PUBLISH_INTERVAL=0`` reports
+only the worker that serves the scrape.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from time import perf_counter
+from psycopg2 import extensions
+from redis.client import Redis, Pipeline
+
+METRICS_PUBLISH_INTERVAL = float(os.getenv('METRICS_PUBLISH_INTERVAL', 10))
+KEY_PREFIX = 'metrics:'
+# Request latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Exposition order, type and help of every metric
+METRICS = {
+    'vote_http_requests_total': ('counter', 'HTTP requests by route, method and status code'),
+    'vote_http_request_duration_seconds': ('histogram', 'Time to produce a response by route and method'),
+    'vote_sql_statements_total': ('counter', 'SQL statements executed by requests, by route'),
+    'vote_sql_seconds_total': ('counter', 'Time spent in SQL statements by requests, by route'),
+    'vote_redis_commands_total': ('counter', 'Redis commands sent by requests, by route'),
+    'vote_redis_seconds_total': ('counter', 'Time spent in Redis round trips by requests, by route'),
+    'vote_votes_enqueued_total': ('counter', 'Votes queued for the ingest worker, by choice'),
+    'vote_db_pool_connections': ('gauge', 'Database pool connections by state'),
+    'vote_db_pool_max_connections': ('gauge', 'Database pool capacity'),
+    'vote_db_pool_checkouts_total': ('counter', 'Database pool checkouts'),
+    'vote_db_pool_waits_total': ('counter', 'Checkouts that waited for a free connection'),
+    'vote_db_pool_wait_seconds_total': ('counter', 'Time spent waiting for a free connection'),
+    'vote_db_pool_checkout_timeouts_total': ('counter', 'Checkouts that timed out'),
+    'vote_sse_clients': ('gauge', 'Connected SSE clients'),
+    'vote_sse_frames_total': ('counter', 'SSE frames queued for clients'),
+    'vote_sse_dropped_total': ('counter', 'SSE frames dropped because a client fell behind'),
+    'vote_metrics_workers': ('gauge', 'Worker processes included in this scrape'),
+}
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def _record_sql(seconds):
+    # The tally is [sql statements, sql seconds, redis commands, redis seconds]
+    tally = getattr(_local, 'tally', None)
+    if tally is not None:
+        tally[0] += 1
+        tally[1] += seconds
+
+
+def _record_redis(commands, seconds):
+    tally = getattr(_local, 'tally', None)
+    if tally is not None:
+        tally[2] += commands
+        tally[3] += seconds
+
+
+_cursor_classes = {}
+
+
+def _timed_cursor_class(base):
+    cls = _cursor_classes.get(base)
+    if cls is None:
+        def execute(self, query, vars=None):
+            started = perf_counter()
+            try:
+                return base.execute(self, query, vars)
+            finally:
+                _record_sql(perf_counter() - started)
+
+        def executemany(self, query, vars_list):
+            started = perf_counter()
+            try:
+                return base.executemany(self, query, vars_list)
+            finally:
+                _record_sql(perf_counter() - started)
+
+        cls = _cursor_classes[base] = type(f'Timed{base.__name__}', (base,),
+                                           {'execute': execute, 'executemany': executemany})
+    return cls
+
+
+class InstrumentedConnection(extensions.connection):
+    """psycopg2 connection whose cursors, of any factory, time their statements"""
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get('cursor_factory') or self.cursor_factory or extensions.cursor
+        kwargs['cursor_factory'] = _timed_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+
+class InstrumentedPipeline(Pipeline):
+    """Pipeline that counts its queued commands as one timed round trip"""
+
+    def execute(self, raise_on_error=True):
+        commands = len(self.command_stack)
+        started = perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            _record_redis(commands, perf_counter() - started)
+
+
+class InstrumentedRedis(Redis):
+    """Redis client that times every command and pipeline"""
+
+    def execute_command(self, *args, **options):
+        started = perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            _record_redis(1, perf_counter() - started)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def pool_samples(pool):
+    """Samples for a db_pool.ConnectionPool"""
+    stats = pool.stats()
+    return [
+        ('vote_db_pool_connections', (('state', 'in_use'),), stats['in_use']),
+        ('vote_db_pool_connections', (('state', 'idle'),), stats['idle']),
+        ('vote_db_pool_connections', (('state', 'connecting'),), stats['connecting']),
+        ('vote_db_pool_max_connections', (), stats['max_size']),
+        ('vote_db_pool_checkouts_total', (), stats['checkouts']),
+        ('vote_db_pool_waits_total', (), stats['waits']),
+        ('vote_db_pool_wait_seconds_total', (), stats['wait_time_total']),
+        ('vote_db_pool_checkout_timeouts_total', (), stats['checkout_timeouts']),
+    ]
+
+
+def sse_samples(router):
+    """Samples for a live_updates.UpdateRouter"""
+    stats = router.stats()
+    return [
+        ('vote_sse_clients', (), stats['clients']),
+        ('vote_sse_frames_total', (), stats['frames']),
+        ('vote_sse_dropped_total', (), stats['dropped']),
+    ]
+
+
+class Metrics:
+    """Counters and histograms of one worker process, shared through Redis"""
+
+    def __init__(self, get_redis, interval=METRICS_PUBLISH_INTERVAL, buckets=LATENCY_BUCKETS):
+        self.get_redis = get_redis
+        self.interval = interval
+        self.buckets = buckets
+        self._collectors = []
+        self._counters = {}
+        # (name, labels) -> per-bucket counts, the +Inf count, then the sum
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def key(self):
+        return f'{KEY_PREFIX}{socket.gethostname()}:{os.getpid()}'
+
+    @property
+    def index_key(self):
+        """Sorted set of this host's snapshot keys, scored by expiry time"""
+        return f'{KEY_PREFIX}{socket.gethostname()}:workers'
+
+    @property
+    def ttl(self):
+        return max(int(self.interval * 3), 30)
+
+    def add_collector(self, collect):
+        """Register a callable returning (name, labels, value) samples"""
+        self._collectors.append(collect)
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def total(self, name):
+        """Sum of a counter over all its labels in this worker"""
+        with self._lock:
+            return sum(value for (counter, _), value in self._counters.items() if counter == name)
+
+    def start_request(self):
+        """Start timing the current request and tallying its SQL and Redis"""
+        self.ensure_running()
+        _local.tally = [0, 0.0, 0, 0.0]
+        _local.started = perf_counter()
+
+    def finish_request(self, route, method, status):
+        tally = getattr(_local, 'tally', None)
+        if tally is None:
+            return
+        elapsed = perf_counter() - _local.started
+        _local.tally = None
+        bucket = bisect_left(self.buckets, elapsed)
+        route_labels = (('route', route),)
+        request_labels = (('route', route), ('method', method))
+        counters = self._counters
+        with self._lock:
+            key = ('vote_http_requests_total', request_labels + (('status', str(status)),))
+            counters[key] = counters.get(key, 0) + 1
+            for index, name in enumerate(('vote_sql_statements_total', 'vote_sql_seconds_total',
+                                          'vote_redis_commands_total', 'vote_redis_seconds_total')):
+                if tally[index]:
+                    key = (name, route_labels)
+                    counters[key] = counters.get(key, 0) + tally[index]
+            histogram = self._histograms.get(('vote_http_request_duration_seconds', request_labels))
+            if histogram is None:
+                histogram = [0] * (len(self.buckets) + 1) + [0.0]
+                self._histograms[('vote_http_request_duration_seconds', request_labels)] = histogram
+            histogram[bucket] += 1
+            histogram[-1] += elapsed
+
+    def snapshot(self):
+        """JSON-serializable copy of this worker's metrics and sampled gauges"""
+        with self._lock:
+            counters = [[name, labels, value] for (name, labels), value in self._counters.items()]
+            histograms = [[name, labels, list(values)] for (name, labels), values in self._histograms.items()]
+        for collect in self._collectors:
+            counters.extend([name, labels, value] for name, labels, value in collect())
+        return {'counters': counters, 'histograms': histograms}
+
+    def publish(self, redis):
+        now = time.time()
+        pipe = redis.pipeline(transaction=False)
+        pipe.set(self.key, json.dumps(self.snapshot()), ex=self.ttl)
+        pipe.zadd(self.index_key, {self.key: now + self.ttl})
+        pipe.zremrangebyscore(self.index_key, '-inf', now)
+        pipe.expire(self.index_key, self.ttl)
+        pipe.execute()
+
+    def collect(self):
+        """Snapshots of every live worker on this host, this one's fresh"""
+        if self.interval <= 0:
+            return [self.snapshot()]
+        redis = self.get_redis()
+        own_key = self.key
+        try:
+            self.publish(redis)
+            keys = [key.decode() if isinstance(key, bytes) else key
+                    for key in redis.zrangebyscore(self.index_key, time.time(), '+inf')]
+            values = redis.mget(keys) if keys else []
+        except Exception as e:
+            logger.warning(f"Could not collect worker metrics, reporting this worker only: {e}")
+            return [self.snapshot()]
+        snapshots = [self.snapshot()]
+        snapshots.extend(json.loads(value) for key, value in zip(keys, values) if value and key != own_key)
+        return snapshots
+
+    def ensure_running(self):
+        """Start the snapshot publisher thread for this process if needed"""
+        if self.interval <= 0 or (self._pid == os.getpid() and self._thread is not None):
+            return
+        with self._lock:
+            # Threads do not survive a fork, so start one per worker process
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='metrics-publisher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.publish(self.get_redis())
+            except Exception as e:
+                logger.error(f"Publishing worker metrics failed: {e}")
+            time.sleep(self.interval)
+
+    def render(self):
+        """Prometheus text exposition of ``collect()``"""
+        return render(self.collect(), self.buckets)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def render(snapshots, buckets=LATENCY_BUCKETS):
+    """Sum worker snapshots and format them as Prometheus text"""
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(label) for label in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(tuple(label) for label in labels))
+            merged = histograms.get(key)
+            histograms[key] = values if merged is None else [a + b for a, b in zip(merged, values)]
+    counters[('vote_metrics_workers', ())] = len(snapshots)
+
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append((labels, value))
+    for (name, labels), values in histograms.items():
+        by_name.setdefault(name, []).append((labels, values))
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        samples = by_name.get(name)
+        if not samples:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(samples):
+            if kind != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
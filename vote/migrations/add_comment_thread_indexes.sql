@@ -0,0 +1,13 @@
+-- Indexes for threaded comment retrieval (comments.py)
+-- Top-level threads are keyset-paged newest first per competition and
+-- replies are fetched oldest first per parent, both skipping deleted rows
+
+CREATE INDEX IF NOT EXISTS idx_comments_threads
+    ON competition_comments(competition_id, created_at DESC, id DESC)
+    WHERE parent_id IS NULL AND deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_comments_replies
+    ON competition_comments(parent_id, created_at, id)
+    WHERE deleted_at IS NULL;
+
+SELECT 'Comment thread indexes ready!' AS status;
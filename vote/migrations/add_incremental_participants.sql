@@ -0,0 +1,146 @@
+-- Incrementally maintained competitions.participant_count
+-- Replaces a COUNT(DISTINCT user_id) over the whole competition on every vote
+
+-- Lets "has this user already voted here?" probe a handful of index entries
+CREATE INDEX IF NOT EXISTS idx_votes_competition_user ON votes(competition_id, user_id);
+
+-- Apply the participant changes of one statement. Each array element is a
+-- (competition, user) pair with the number of its rows the statement removed
+-- and added; the user's count changes when they had rows before the statement
+-- but none after, or the other way round. Concurrent transactions adding a
+-- user's first rows under two voter ids can both count them;
+-- rebuild_participant_counts() corrects that.
+CREATE OR REPLACE FUNCTION apply_participant_changes(p_competition_ids INTEGER[], p_user_ids INTEGER[],
+                                                     p_removed BIGINT[], p_added BIGINT[])
+RETURNS void AS $$
+    UPDATE competitions c
+    SET participant_count = GREATEST(COALESCE(c.participant_count, 0) + d.delta, 0)
+    FROM (
+        SELECT g.competition_id,
+               SUM((n.remaining > 0)::INTEGER - (n.remaining - g.added + g.removed > 0)::INTEGER) AS delta
+        FROM unnest(p_competition_ids, p_user_ids, p_removed, p_added)
+             AS g(competition_id, user_id, removed, added)
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*) AS remaining FROM votes v
+            WHERE v.competition_id = g.competition_id AND v.user_id = g.user_id
+        ) n
+        GROUP BY g.competition_id
+        HAVING SUM((n.remaining > 0)::INTEGER - (n.remaining - g.added + g.removed > 0)::INTEGER) <> 0
+    ) d
+    WHERE c.id = d.competition_id;
+$$ LANGUAGE sql;
+
+-- Statement-level triggers see every row a statement touched at once (a
+-- multi-row upsert or delete can add or remove several rows of one user), so
+-- the changes are grouped per (competition, user) before they are applied.
+-- Transition tables need one trigger per event.
+CREATE OR REPLACE FUNCTION participants_after_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM apply_participant_changes(array_agg(competition_id), array_agg(user_id),
+                                      array_agg(0::BIGINT), array_agg(added))
+    FROM (
+        SELECT competition_id, user_id, COUNT(*) AS added
+        FROM new_votes
+        WHERE competition_id IS NOT NULL AND user_id IS NOT NULL
+        GROUP BY competition_id, user_id
+    ) changes;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION participants_after_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Pairs whose row count did not change (e.g. a changed vote) are skipped
+    PERFORM apply_participant_changes(array_agg(competition_id), array_agg(user_id),
+                                      array_agg(removed), array_agg(added))
+    FROM (
+        SELECT competition_id, user_id, SUM(removed) AS removed, SUM(added) AS added
+        FROM (
+            SELECT competition_id, user_id, 1 AS removed, 0 AS added FROM old_votes
+            UNION ALL
+            SELECT competition_id, user_id, 0, 1 FROM new_votes
+        ) touched
+        WHERE competition_id IS NOT NULL AND user_id IS NOT NULL
+        GROUP BY competition_id, user_id
+        HAVING SUM(removed) <> SUM(added)
+    ) changes;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION participants_after_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM apply_participant_changes(array_agg(competition_id), array_agg(user_id),
+                                      array_agg(removed), array_agg(0::BIGINT))
+    FROM (
+        SELECT competition_id, user_id, COUNT(*) AS removed
+        FROM old_votes
+        WHERE competition_id IS NOT NULL AND user_id IS NOT NULL
+        GROUP BY competition_id, user_id
+    ) changes;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Replace the per-row trigger from add_user_features.sql
+DROP TRIGGER IF EXISTS update_comp_participants ON votes;
+DROP FUNCTION IF EXISTS update_participant_count();
+
+DROP TRIGGER IF EXISTS participants_insert ON votes;
+CREATE TRIGGER participants_insert
+    AFTER INSERT ON votes
+    REFERENCING NEW TABLE AS new_votes
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION participants_after_insert();
+
+DROP TRIGGER IF EXISTS participants_update ON votes;
+CREATE TRIGGER participants_update
+    AFTER UPDATE ON votes
+    REFERENCING OLD TABLE AS old_votes NEW TABLE AS new_votes
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION participants_after_update();
+
+DROP TRIGGER IF EXISTS participants_delete ON votes;
+CREATE TRIGGER participants_delete
+    AFTER DELETE ON votes
+    REFERENCING OLD TABLE AS old_votes
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION participants_after_delete();
+
+-- Recount participants from the votes table (all competitions when NULL)
+CREATE OR REPLACE FUNCTION rebuild_participant_counts(p_competition_id INTEGER DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    rebuilt INTEGER;
+BEGIN
+    -- Hold off concurrent vote writes so the recount cannot race the trigger
+    LOCK TABLE votes IN SHARE MODE;
+
+    UPDATE competitions c
+    SET participant_count = COALESCE(p.participants, 0)
+    FROM competitions c2
+    LEFT JOIN (
+        SELECT competition_id, COUNT(DISTINCT user_id) AS participants
+        FROM votes
+        WHERE competition_id IS NOT NULL
+          AND (p_competition_id IS NULL OR competition_id = p_competition_id)
+        GROUP BY competition_id
+    ) p ON p.competition_id = c2.id
+    WHERE c.id = c2.id
+      AND (p_competition_id IS NULL OR c.id = p_competition_id)
+      AND c.participant_count IS DISTINCT FROM COALESCE(p.participants, 0);
+
+    GET DIAGNOSTICS rebuilt = ROW_COUNT;
+    RETURN rebuilt;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Correct any drift left by the previous trigger (which missed deletes)
+SELECT rebuild_participant_counts();
+
+COMMENT ON FUNCTION rebuild_participant_counts(INTEGER) IS 'Recount competitions.participant_count from votes; returns rows changed';
+
+SELECT 'Incremental participant counts ready!' AS status;
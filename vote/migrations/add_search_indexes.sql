@@ -0,0 +1,23 @@
+-- Indexed full-text and trigram search for competitions
+-- Replaces unindexable name/description ILIKE '%q%' scans
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Weighted document: name matches rank above description matches.
+-- A stored generated column is kept in sync by Postgres on every write.
+ALTER TABLE competitions
+ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'B')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_competitions_search_vector ON competitions USING GIN(search_vector);
+
+-- Trigram indexes keep substring (ILIKE) matching and similarity ranking indexable
+CREATE INDEX IF NOT EXISTS idx_competitions_name_trgm ON competitions USING GIN(name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_competitions_description_trgm ON competitions USING GIN(description gin_trgm_ops);
+
+COMMENT ON COLUMN competitions.search_vector IS 'Weighted full-text document over name (A) and description (B)';
+
+SELECT 'Competition search indexes ready!' AS status;
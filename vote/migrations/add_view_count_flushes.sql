@@ -0,0 +1,14 @@
+-- Batches of buffered view counts already applied (view_counts.py)
+-- A flush records its batch id in the same transaction as the UPDATE, so a
+-- batch retried after a crash between the commit and the Redis cleanup is
+-- skipped instead of counted twice
+
+CREATE TABLE IF NOT EXISTS view_count_flushes (
+    batch_id VARCHAR(64) PRIMARY KEY,
+    flushed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Old batch ids are pruned by each flush
+CREATE INDEX IF NOT EXISTS idx_view_count_flushes_flushed_at ON view_count_flushes(flushed_at);
+
+SELECT 'View count flush log ready!' AS status;
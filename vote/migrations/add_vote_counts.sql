@@ -0,0 +1,98 @@
+-- Incrementally maintained vote tallies per competition
+-- Replaces COUNT(*) ... GROUP BY vote scans on every score read
+
+CREATE TABLE IF NOT EXISTS competition_vote_counts (
+    competition_id INTEGER PRIMARY KEY,
+    votes_a INTEGER NOT NULL DEFAULT 0,
+    votes_b INTEGER NOT NULL DEFAULT 0,
+    total_votes INTEGER NOT NULL DEFAULT 0,
+    last_vote_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (competition_id) REFERENCES competitions(id) ON DELETE CASCADE
+);
+
+-- Apply a +1/-1 change for one vote choice
+CREATE OR REPLACE FUNCTION apply_vote_count_delta(p_competition_id INTEGER, p_vote VARCHAR, p_delta INTEGER)
+RETURNS void AS $$
+BEGIN
+    IF p_competition_id IS NULL OR p_vote NOT IN ('a', 'b') THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO competition_vote_counts (competition_id, votes_a, votes_b, total_votes, last_vote_at)
+    VALUES (
+        p_competition_id,
+        CASE WHEN p_vote = 'a' THEN GREATEST(p_delta, 0) ELSE 0 END,
+        CASE WHEN p_vote = 'b' THEN GREATEST(p_delta, 0) ELSE 0 END,
+        GREATEST(p_delta, 0),
+        CASE WHEN p_delta > 0 THEN CURRENT_TIMESTAMP END
+    )
+    ON CONFLICT (competition_id) DO UPDATE
+    SET votes_a = competition_vote_counts.votes_a + CASE WHEN p_vote = 'a' THEN p_delta ELSE 0 END,
+        votes_b = competition_vote_counts.votes_b + CASE WHEN p_vote = 'b' THEN p_delta ELSE 0 END,
+        total_votes = competition_vote_counts.total_votes + p_delta,
+        last_vote_at = CASE WHEN p_delta > 0 THEN CURRENT_TIMESTAMP
+                            ELSE competition_vote_counts.last_vote_at END,
+        updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_competition_vote_counts()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM apply_vote_count_delta(NEW.competition_id, NEW.vote, 1);
+    ELSIF TG_OP = 'UPDATE' THEN
+        IF NEW.vote IS DISTINCT FROM OLD.vote
+           OR NEW.competition_id IS DISTINCT FROM OLD.competition_id THEN
+            PERFORM apply_vote_count_delta(OLD.competition_id, OLD.vote, -1);
+            PERFORM apply_vote_count_delta(NEW.competition_id, NEW.vote, 1);
+        END IF;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM apply_vote_count_delta(OLD.competition_id, OLD.vote, -1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS maintain_competition_vote_counts ON votes;
+CREATE TRIGGER maintain_competition_vote_counts
+    AFTER INSERT OR UPDATE OF vote, competition_id OR DELETE ON votes
+    FOR EACH ROW
+    EXECUTE FUNCTION update_competition_vote_counts();
+
+-- Recompute tallies from the votes table (all competitions when NULL)
+CREATE OR REPLACE FUNCTION rebuild_competition_vote_counts(p_competition_id INTEGER DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    rebuilt INTEGER;
+BEGIN
+    -- Hold off concurrent vote writes so the recount cannot race the trigger
+    LOCK TABLE votes IN SHARE MODE;
+
+    DELETE FROM competition_vote_counts
+    WHERE p_competition_id IS NULL OR competition_id = p_competition_id;
+
+    INSERT INTO competition_vote_counts (competition_id, votes_a, votes_b, total_votes, last_vote_at)
+    SELECT competition_id,
+           COUNT(*) FILTER (WHERE vote = 'a'),
+           COUNT(*) FILTER (WHERE vote = 'b'),
+           COUNT(*) FILTER (WHERE vote IN ('a', 'b')),
+           MAX(created_at)
+    FROM votes
+    WHERE competition_id IS NOT NULL
+      AND (p_competition_id IS NULL OR competition_id = p_competition_id)
+    GROUP BY competition_id;
+
+    GET DIAGNOSTICS rebuilt = ROW_COUNT;
+    RETURN rebuilt;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill existing votes
+SELECT rebuild_competition_vote_counts();
+
+COMMENT ON TABLE competition_vote_counts IS 'Per-competition vote tallies maintained by trigger on votes';
+COMMENT ON COLUMN competition_vote_counts.last_vote_at IS 'When the most recent vote for this competition was recorded';
+
+SELECT 'Competition vote counts table ready!' AS status;
@@ -0,0 +1,14 @@
+-- Only bump competitions.updated_at when competition content changes
+-- Counter writes (batched view_count flushes, participant_count and
+-- trending_score maintenance) no longer fire the trigger or touch updated_at
+
+DROP TRIGGER IF EXISTS update_competitions_updated_at ON competitions;
+CREATE TRIGGER update_competitions_updated_at
+    BEFORE UPDATE OF name, description, option_a, option_b, tags, image_url, status,
+                     scheduled_start, scheduled_end, closed_at, deleted_at, is_archived,
+                     archived_at, created_by
+    ON competitions
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+SELECT 'updated_at trigger restricted to content columns!' AS status;
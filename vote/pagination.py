@@ -0,0 +1,124 @@
+"""Keyset (cursor) pagination helpers for list endpoints.
+
+A sort order is a list of :class:`SortKey` ending in a unique column. Pages
+are fetched with ``WHERE <keyset condition> ORDER BY ... LIMIT n + 1`` so the
+extra row tells us whether another page exists, and the last returned row's
+key values are encoded into an opaque cursor for the next request.
+"""
+import base64
+import binascii
+import json
+import os
+from collections import namedtuple
+from datetime import date, datetime
+
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 200))
+
+# expr: SQL expression ordered on; column: key of that value in the result row;
+# cast: SQL type the cursor value is compared as; null_value: substitute for a
+# NULL column so the comparison stays total (must match the expr's COALESCE).
+SortKey = namedtuple('SortKey', ['expr', 'column', 'descending', 'cast', 'null_value'])
+SortKey.__new__.__defaults__ = (None,)
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that is malformed or belongs to another sort order"""
+    pass
+
+
+def parse_page_size(raw, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Clamp a ``limit`` query parameter to 1..maximum"""
+    try:
+        size = int(raw) if raw not in (None, '') else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def encode_cursor(sort_name, keys, row):
+    """Encode the key values of ``row`` as an opaque URL-safe token"""
+    values = []
+    for key in keys:
+        value = row[key.column]
+        if value is None:
+            value = key.null_value
+        elif isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        values.append(value)
+    payload = json.dumps({'s': sort_name, 'v': values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, sort_name, keys):
+    """Decode a token produced by :func:`encode_cursor` for the same sort"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload['v']
+        cursor_sort = payload['s']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidCursor('Malformed cursor')
+    if cursor_sort != sort_name or not isinstance(values, list) or len(values) != len(keys):
+        raise InvalidCursor('Cursor does not match this sort order')
+    return values
+
+
+def keyset_condition(keys, values, expr_params=None):
+    """Build ``(sql, params)`` selecting rows strictly after ``values``.
+
+    Expands to ``k1 > v1 OR (k1 = v1 AND k2 > v2) OR ...`` with each
+    comparison flipped for descending keys, which works for mixed directions
+    where a plain row comparison would not. ``expr_params`` maps a key's
+    column to parameters used inside its expression (e.g. a search rank).
+    """
+    expr_params = expr_params or {}
+    clauses = []
+    params = []
+    for i, key in enumerate(keys):
+        parts = []
+        for prior, value in zip(keys[:i], values[:i]):
+            parts.append(f"{prior.expr} = %s::{prior.cast}")
+            params.extend(expr_params.get(prior.column, []))
+            params.append(value)
+        parts.append(f"{key.expr} {'<' if key.descending else '>'} %s::{key.cast}")
+        params.extend(expr_params.get(key.column, []))
+        params.append(values[i])
+        clauses.append('(' + ' AND '.join(parts) + ')')
+    return '(' + ' OR '.join(clauses) + ')', params
+
+
+def order_by(keys, expr_params=None):
+    """Return ``(sql, params)`` for the ORDER BY list of a sort order"""
+    expr_params = expr_params or {}
+    params = []
+    for key in keys:
+        params.extend(expr_params.get(key.column, []))
+    return ', '.join(f"{key.expr} {'DESC' if key.descending else 'ASC'}" for key in keys), params
+
+
+def apply_keyset(sql, params, keys, sort_name, token, limit, expr_params=None):
+    """Append cursor condition, ORDER BY and ``LIMIT limit + 1`` to a query.
+
+    ``sql`` must end inside its WHERE clause. Raises :class:`InvalidCursor`
+    for a bad ``token``.
+    """
+    params = list(params)
+    if token:
+        values = decode_cursor(token, sort_name, keys)
+        condition, condition_params = keyset_condition(keys, values, expr_params)
+        sql += f" AND {condition}"
+        params.extend(condition_params)
+    order_sql, order_params = order_by(keys, expr_params)
+    sql += f" ORDER BY {order_sql} LIMIT %s"
+    params.extend(order_params)
+    params.append(limit + 1)
+    return sql, params
+
+
+def paginate(rows, limit, sort_name, keys):
+    """Trim a ``limit + 1`` fetch to one page and return ``(rows, next_cursor)``"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(sort_name, keys, rows[-1])
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Backfill or rebuild the competition_vote_counts aggregate and participant counts"""
+import os
+import sys
+import psycopg2
+
+# Database configuration
+db_host = os.getenv('DB_HOST', 'db')
+db_port = int(os.getenv('DB_PORT', 5432))
+db_name = os.getenv('DB_NAME', 'postgres')
+db_user = os.getenv('POSTGRES_USER', 'postgres')
+db_password = os.getenv('POSTGRES_PASSWORD', 'postgres')
+
+connection_string = f"dbname={db_name} user={db_user} password={db_password} host={db_host} port={db_port}"
+
+def rebuild_tallies(competition_id=None):
+    """Recount tallies for one competition, or all of them"""
+    try:
+        conn = psycopg2.connect(connection_string)
+        cursor = conn.cursor()
+        
+        target = f"competition {competition_id}" if competition_id else "all competitions"
+        print(f"[*] Rebuilding vote tallies for {target}...")
+        
+        cursor.execute("SELECT rebuild_competition_vote_counts(%s)", (competition_id,))
+        rebuilt = cursor.fetchone()[0]
+        conn.commit()
+        print(f"[✓] Rebuilt {rebuilt} tally row(s)")
+        
+        print(f"[*] Recounting participants for {target}...")
+        cursor.execute("SELECT rebuild_participant_counts(%s)", (competition_id,))
+        corrected = cursor.fetchone()[0]
+        conn.commit()
+        
+        cursor.close()
+        conn.close()
+        print(f"[✓] Corrected {corrected} participant count(s)")
+        return True
+    
+    except Exception as e:
+        print(f"[✗] Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == '__main__':
+    competition_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    success = rebuild_tallies(competition_id)
+    exit(0 if success else 1)
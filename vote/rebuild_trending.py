@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Rebuild the Redis trending window and stored trending scores from Postgres"""
+import os
+import psycopg2
+import trending
+from redis_client import get_redis_client
+
+# Database configuration
+db_host = os.getenv('DB_HOST', 'db')
+db_port = int(os.getenv('DB_PORT', 5432))
+db_name = os.getenv('DB_NAME', 'postgres')
+db_user = os.getenv('POSTGRES_USER', 'postgres')
+db_password = os.getenv('POSTGRES_PASSWORD', 'postgres')
+
+connection_string = f"dbname={db_name} user={db_user} password={db_password} host={db_host} port={db_port}"
+
+def rebuild_trending():
+    """Recompute the 24h trending window"""
+    try:
+        conn = psycopg2.connect(connection_string)
+        
+        print("[*] Rebuilding trending window...")
+        ranked = trending.rebuild(get_redis_client(), conn)
+        
+        conn.close()
+        print(f"[✓] Trending window rebuilt with {ranked} competition(s)")
+        return True
+    
+    except Exception as e:
+        print(f"[✗] Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == '__main__':
+    success = rebuild_trending()
+    exit(0 if success else 1)
@@ -0,0 +1,62 @@
+"""Compact row records for hot listing paths.
+
+``RealDictCursor`` builds a dict per row in Python. Listing queries that
+return many rows can instead read tuples from a plain cursor and wrap each
+one in a slotted dataclass: no per-row dict, a single positional constructor
+call per row, and native serialization by orjson. Records also support item
+access, so helpers written for dict rows (pagination, tallies) accept them.
+"""
+from dataclasses import make_dataclass
+
+
+class Record:
+    """Dict-style access to a slotted record's fields"""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+def record_class(name, columns, extra=()):
+    """Slotted dataclass built positionally from rows selecting ``columns``.
+
+    ``extra`` fields default to None; they can be filled in later or, in
+    order, by trailing selected columns.
+    """
+    fields = list(columns) + [(field, object, None) for field in extra]
+    return make_dataclass(name, fields, bases=(Record,), slots=True)
+
+
+def fetch_records(cursor, cls):
+    """Wrap every row of a plain (tuple) cursor in ``cls``"""
+    return [cls(*row) for row in cursor.fetchall()]
+
+
+# /api/competitions listing rows: the selected columns, then the relevance
+# rank (selected only when sorting by relevance) and the fields attach_tallies
+# and the listing fill in
+COMPETITION_LISTING_COLUMNS = (
+    'id', 'name', 'description', 'option_a', 'option_b', 'tags', 'image_url',
+    'status', 'created_at', 'updated_at', 'is_archived', 'trending_score',
+    'view_count', 'participant_count', 'scheduled_end',
+)
+CompetitionListingRecord = record_class(
+    'CompetitionListingRecord', COMPETITION_LISTING_COLUMNS,
+    extra=('search_rank', 'votes_a', 'votes_b', 'total_votes', 'percentage_a', 'percentage_b',
+           'is_favorited'),
+)
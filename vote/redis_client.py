@@ -0,0 +1,45 @@
+"""Process-wide Redis connection pool shared by the voting app"""
+import os
+from redis import Redis, ConnectionPool
+from metrics import InstrumentedRedis
+
+redis_host = os.getenv('REDIS_HOST', 'redis')
+redis_port = int(os.getenv('REDIS_PORT', 6379))
+REDIS_POOL_MAX_CONNECTIONS = int(os.getenv('REDIS_POOL_MAX_CONNECTIONS', 50))
+
+# redis-py pools detect forks and rebuild themselves in the child, so a single
+# module-level pool is safe under gunicorn's pre-fork model.
+redis_pool = ConnectionPool(
+    host=redis_host,
+    port=redis_port,
+    db=0,
+    socket_timeout=5,
+    max_connections=REDIS_POOL_MAX_CONNECTIONS,
+    health_check_interval=30,
+)
+
+# Subscriptions block on reads for as long as the subscriber lives, so they get
+# their own pool without the request-path socket timeout and cannot starve
+# request handlers of connections.
+pubsub_pool = ConnectionPool(
+    host=redis_host,
+    port=redis_port,
+    db=0,
+    socket_timeout=None,
+    health_check_interval=30,
+)
+
+# Request-path commands are timed for /metrics (see metrics.py); the pub/sub
+# client is not, its reads block for as long as a subscriber waits
+_client = InstrumentedRedis(connection_pool=redis_pool)
+_pubsub_client = Redis(connection_pool=pubsub_pool)
+
+
+def get_redis_client() -> Redis:
+    """Return the shared Redis client backed by the process-wide pool"""
+    return _client
+
+
+def get_pubsub_client() -> Redis:
+    """Return the shared client used for long-lived pub/sub subscriptions"""
+    return _pubsub_client
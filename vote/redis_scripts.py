@@ -0,0 +1,51 @@
+"""Lua scripts that can be queued on pipelines without extra round trips.
+
+A redis-py ``Script`` queued on a pipeline makes every ``execute()`` first
+send a blocking SCRIPT EXISTS for it. ``PipelineScript`` instead loads its
+source once per process and is queued as a plain EVALSHA. If Redis has lost
+the script (a restart or SCRIPT FLUSH), :func:`execute` re-runs the commands
+that got NOSCRIPT with EVAL, and the script is loaded again on its next use.
+"""
+import hashlib
+from redis.exceptions import NoScriptError
+
+_by_sha = {}
+
+
+class PipelineScript:
+    """A Lua script run by SHA, directly or queued on a pipeline"""
+
+    def __init__(self, source):
+        self.source = source
+        self.sha = hashlib.sha1(source.encode()).hexdigest()
+        self.loaded = False
+        _by_sha[self.sha] = self
+
+    def queue(self, redis, pipe, keys, args):
+        """Queue the script on ``pipe``; run the pipeline with :func:`execute`"""
+        if not self.loaded:
+            redis.script_load(self.source)
+            self.loaded = True
+        pipe.evalsha(self.sha, len(keys), *keys, *args)
+
+    def __call__(self, redis, keys, args):
+        """Run the script now"""
+        try:
+            return redis.evalsha(self.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            self.loaded = False
+            return redis.eval(self.source, len(keys), *keys, *args)
+
+
+def execute(redis, pipe):
+    """Execute ``pipe``, re-running any queued script Redis no longer knew"""
+    commands = [args for args, _ in pipe.command_stack]
+    results = pipe.execute(raise_on_error=False)
+    for index, result in enumerate(results):
+        if isinstance(result, NoScriptError):
+            script = _by_sha[commands[index][1]]
+            script.loaded = False
+            results[index] = redis.eval(script.source, *commands[index][2:])
+        elif isinstance(result, Exception):
+            raise result
+    return results
@@ -0,0 +1,131 @@
+"""Redis-backed response cache with generation-based invalidation.
+
+Entries live under ``cache:<name>:<generation>:<params>``. Invalidating a
+cache bumps its generation counter, so every worker process stops seeing old
+entries at once and a render that raced the invalidation can only write into
+the dead generation, where it simply expires. Passing a ``scope`` (e.g. a
+competition id) gives that scope its own generation under
+``cache:<name>:<scope>:``, so it can be invalidated without the rest.
+
+Throttled invalidations (votes, likes) fire when the event is queued, before
+the worker has written it, so the next render can still miss it. Each one
+therefore also marks the cache hot for the throttle interval, and entries
+stored while it is hot expire after that interval instead of the full TTL.
+Once the events stop, listings lag the database by at most the interval
+(given the worker keeps up within it).
+"""
+import hashlib
+import json
+import os
+import threading
+from redis.exceptions import RedisError
+from redis_scripts import PipelineScript
+
+CACHE_TTL = int(os.getenv('API_CACHE_TTL', 30))
+VOTE_INVALIDATE_INTERVAL_MS = int(os.getenv('API_CACHE_VOTE_INVALIDATE_MS', 1000))
+
+_GET_LUA = """
+local generation = redis.call('GET', KEYS[1]) or '0'
+return {generation, redis.call('GET', ARGV[1] .. generation .. ':' .. ARGV[2])}
+"""
+_get_script = PipelineScript(_GET_LUA)
+
+_THROTTLED_INVALIDATE_LUA = """
+redis.call('SET', KEYS[3], ARGV[1], 'PX', ARGV[1])
+if redis.call('SET', KEYS[2], '1', 'NX', 'PX', ARGV[1]) then
+    return redis.call('INCR', KEYS[1])
+end
+return false
+"""
+_throttled_invalidate_script = PipelineScript(_THROTTLED_INVALIDATE_LUA)
+
+# Stores with the hot marker's interval (ms) as the expiry while it exists
+_SET_LUA = """
+local hot = redis.call('GET', KEYS[2])
+if hot then
+    return redis.call('SET', KEYS[1], ARGV[1], 'PX', hot)
+end
+return redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+"""
+_set_script = PipelineScript(_SET_LUA)
+
+
+class ResponseCache:
+    """Cache of serialized response bodies for one endpoint"""
+
+    def __init__(self, name, ttl=CACHE_TTL):
+        self.name = name
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'errors': 0, 'invalidations': 0}
+
+    def _prefix(self, scope=None):
+        if scope is None:
+            return f'cache:{self.name}:'
+        return f'cache:{self.name}:{scope}:'
+
+    @property
+    def generation_key(self):
+        return self._prefix() + 'generation'
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    @staticmethod
+    def params_digest(params):
+        """Stable digest of already-normalized query parameters"""
+        encoded = json.dumps(params, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha1(encoded.encode()).hexdigest()
+
+    def get(self, redis, params, scope=None):
+        """Return (generation, body); body is None on a miss"""
+        prefix = self._prefix(scope)
+        try:
+            generation, body = _get_script(redis, [prefix + 'generation'],
+                                           [prefix, self.params_digest(params)])
+        except RedisError:
+            self._count('errors')
+            return None, None
+        self._count('hits' if body is not None else 'misses')
+        return generation, body
+
+    def set(self, redis, generation, params, body, scope=None):
+        """Store a rendered body under the generation it was read with"""
+        if generation is None:
+            return
+        prefix = self._prefix(scope)
+        key = f'{prefix}{generation.decode()}:{self.params_digest(params)}'
+        try:
+            _set_script(redis, [key, prefix + 'hot'], [body, self.ttl])
+        except RedisError:
+            self._count('errors')
+
+    def invalidate(self, redis, scope=None):
+        """Drop every cached entry (of ``scope``) immediately"""
+        try:
+            redis.incr(self._prefix(scope) + 'generation')
+            self._count('invalidations')
+        except RedisError:
+            self._count('errors')
+
+    def invalidate_throttled(self, redis, pipe, interval_ms=VOTE_INVALIDATE_INTERVAL_MS, scope=None):
+        """Queue an invalidation on ``pipe`` (run it with ``redis_scripts.execute``)
+        that fires at most once per interval, and keep new entries short-lived
+        for the interval.
+
+        Used for high-frequency events such as votes, where bumping the
+        generation on every event would keep the cache permanently cold.
+        """
+        prefix = self._prefix(scope)
+        _throttled_invalidate_script.queue(
+            redis, pipe, [prefix + 'generation', prefix + 'vote-throttle', prefix + 'hot'], [interval_ms])
+
+    def stats(self):
+        """Hit/miss counters for this worker process"""
+        with self._lock:
+            snapshot = dict(self._stats)
+        lookups = snapshot['hits'] + snapshot['misses']
+        snapshot['hit_ratio'] = round(snapshot['hits'] / lookups, 4) if lookups else 0.0
+        snapshot['ttl'] = self.ttl
+        return snapshot
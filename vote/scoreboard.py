@@ -0,0 +1,161 @@
+"""Redis-resident live scoreboard for competitions.
+
+Each competition has a hash of option counters (``scoreboard:<id>``) and a
+hash of each voter's current choice (``scoreboard:<id>:voters``) so a change
+of vote moves a point between options instead of adding one. Boards are
+seeded from Postgres on a miss and expire after ``SCOREBOARD_TTL`` seconds,
+which bounds any drift against the database.
+"""
+import os
+import trending
+from redis_scripts import PipelineScript
+
+SCOREBOARD_TTL = int(os.getenv('SCOREBOARD_TTL', 3600))
+SEED_CHUNK_SIZE = 5000
+
+# Only counts when the board exists; for an unseeded board the caller seeds
+# it and runs the script again (see seed_and_record). A voter's first vote in
+# the competition also bumps the trending bucket and window (KEYS[3..4]). When
+# the vote changed the board, the new counts and the per-option delta are
+# published to every channel in ARGV[6..] from inside the script, so
+# subscribers never see counts out of order.
+_RECORD_VOTE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local prev = redis.call('HGET', KEYS[2], ARGV[1])
+local delta = {a = 0, b = 0}
+if prev ~= ARGV[2] then
+    redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+    redis.call('HINCRBY', KEYS[1], ARGV[2], 1)
+    delta[ARGV[2]] = 1
+    if prev then
+        redis.call('HINCRBY', KEYS[1], prev, -1)
+        delta[prev] = -1
+    else
+        redis.call('ZINCRBY', KEYS[3], 1, ARGV[3])
+        redis.call('EXPIRE', KEYS[3], ARGV[5])
+        redis.call('ZINCRBY', KEYS[4], 1, ARGV[3])
+    end
+end
+local votes_a = tonumber(redis.call('HGET', KEYS[1], 'a') or 0)
+local votes_b = tonumber(redis.call('HGET', KEYS[1], 'b') or 0)
+if prev ~= ARGV[2] and #ARGV > 5 then
+    local message = cjson.encode({
+        competition_id = tonumber(ARGV[3]),
+        timestamp = ARGV[4],
+        votes_a = votes_a,
+        votes_b = votes_b,
+        total_votes = votes_a + votes_b,
+        delta = delta
+    })
+    for i = 6, #ARGV do
+        redis.call('PUBLISH', ARGV[i], message)
+    end
+end
+return {tostring(votes_a), tostring(votes_b), prev or ''}
+"""
+
+_record_script = PipelineScript(_RECORD_VOTE_LUA)
+
+
+def board_key(competition_id):
+    return f'scoreboard:{competition_id}'
+
+
+def voters_key(competition_id):
+    return f'scoreboard:{competition_id}:voters'
+
+
+def _record_args(competition_id, user_id, choice, channels, timestamp):
+    return ([board_key(competition_id), voters_key(competition_id), *trending.vote_keys()],
+            [user_id, choice, competition_id, timestamp, trending.BUCKET_TTL, *channels])
+
+
+def record_vote(redis, pipe, competition_id, user_id, choice, channels=(), timestamp=''):
+    """Queue the counter update for a vote on ``pipe`` (run it with
+    ``redis_scripts.execute``).
+
+    The pipeline result for this command is ``None`` when the board is not
+    seeded, otherwise ``[votes_a, votes_b, previous_choice]`` as bytes; pass it
+    to :func:`parse_record_result`. A seeded board publishes the update to
+    ``channels`` and counts a first vote for trending itself; for an unseeded
+    one call :func:`seed_and_record`.
+    """
+    keys, args = _record_args(competition_id, user_id, choice, channels, timestamp)
+    _record_script.queue(redis, pipe, keys, args)
+
+
+def parse_record_result(result):
+    """Turn a :func:`record_vote` reply into ``(counts, previous_choice)``"""
+    if result is None:
+        return None, None
+    votes_a, votes_b, prev = result
+    counts = {'a': int(votes_a or 0), 'b': int(votes_b or 0)}
+    return counts, (prev.decode() if prev else None)
+
+
+def get_scores(redis, competition_id):
+    """Return {'a': n, 'b': n} from the live board, or None when not seeded"""
+    board = redis.hgetall(board_key(competition_id))
+    if not board:
+        return None
+    return {'a': int(board.get(b'a', 0)), 'b': int(board.get(b'b', 0))}
+
+
+def seed(redis, cursor, competition_id):
+    """Build the board from Postgres and return its counts.
+
+    ``cursor`` must be a RealDictCursor. Votes still waiting in the Redis
+    queue are not in Postgres yet, so a freshly seeded board can lag by the
+    queue depth until it next expires and is reseeded.
+    """
+    cursor.execute("""
+        SELECT votes_a, votes_b FROM competition_vote_counts
+        WHERE competition_id = %s
+    """, (competition_id,))
+    row = cursor.fetchone()
+    counts = {'a': row['votes_a'], 'b': row['votes_b']} if row else {'a': 0, 'b': 0}
+
+    cursor.execute("""
+        SELECT user_id, vote FROM votes
+        WHERE competition_id = %s AND user_id IS NOT NULL AND vote IN ('a', 'b')
+    """, (competition_id,))
+    voters = cursor.fetchall()
+
+    pipe = redis.pipeline(transaction=True)
+    pipe.delete(board_key(competition_id), voters_key(competition_id))
+    pipe.hset(board_key(competition_id), mapping=counts)
+    for start in range(0, len(voters), SEED_CHUNK_SIZE):
+        chunk = voters[start:start + SEED_CHUNK_SIZE]
+        pipe.hset(voters_key(competition_id), mapping={row['user_id']: row['vote'] for row in chunk})
+    pipe.expire(board_key(competition_id), SCOREBOARD_TTL)
+    pipe.expire(voters_key(competition_id), SCOREBOARD_TTL)
+    pipe.execute()
+    return counts
+
+
+def seed_and_record(redis, cursor, competition_id, user_id, choice, channels=(), timestamp=''):
+    """Seed a cold board from Postgres, then count (and publish) the vote on it.
+
+    The vote is still in the queue, not in Postgres, so seeding alone would
+    leave it out. If the worker already stored it, the seeded voter hash has
+    the same choice and the script counts nothing. Returns the counts.
+    """
+    seed(redis, cursor, competition_id)
+    keys, args = _record_args(competition_id, user_id, choice, channels, timestamp)
+    counts, _ = parse_record_result(_record_script(redis, keys, args))
+    return counts
+
+
+def get_or_seed_scores(redis, cursor, competition_id):
+    """Return (counts, source) reading Redis first and seeding on a miss"""
+    scores = get_scores(redis, competition_id)
+    if scores is not None:
+        return scores, 'live'
+    return seed(redis, cursor, competition_id), 'db'
+
+
+def drop(redis, competition_id):
+    """Forget a competition's board, e.g. after its votes were deleted"""
+    redis.delete(board_key(competition_id), voters_key(competition_id))
@@ -0,0 +1,34 @@
+"""Shared competition search backed by full-text and trigram indexes.
+
+Requires migrations/add_search_indexes.sql. A competition matches when its
+``search_vector`` matches the query as a web-style full-text search or when
+the term occurs as a substring of its name or description (served by the
+pg_trgm indexes). Results rank by text relevance plus name similarity.
+"""
+from collections import namedtuple
+
+SearchFilter = namedtuple('SearchFilter', ['where', 'where_params', 'rank', 'rank_params'])
+
+
+def escape_like(term):
+    """Escape LIKE wildcards so user input only matches literally"""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def build_search(query, alias=''):
+    """Return the WHERE condition and rank expression for a search term.
+
+    ``alias`` is the table alias used in the surrounding query, if any.
+    """
+    prefix = f'{alias}.' if alias else ''
+    pattern = f'%{escape_like(query)}%'
+    where = (
+        f"({prefix}search_vector @@ websearch_to_tsquery('english', %s)"
+        f" OR {prefix}name ILIKE %s OR {prefix}description ILIKE %s)"
+    )
+    # float8 so the value round-trips exactly through pagination cursors
+    rank = (
+        f"(ts_rank({prefix}search_vector, websearch_to_tsquery('english', %s))"
+        f" + similarity({prefix}name, %s))::float8"
+    )
+    return SearchFilter(where, [query, pattern, pattern], rank, [query, query])
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""Standalone asyncio gateway for the live vote SSE streams.
+
+Serves ``/api/admin/vote-stream`` and ``/api/user/vote-stream`` with the same
+JWT cookie/bearer auth, competition filter, coalescing and heartbeats as the
+Flask endpoints, but every connection is a coroutine instead of a gunicorn
+worker or thread, so one process holds tens of thousands of streams while the
+Flask workers only serve request/response traffic. Pages use it when the
+vote app is started with ``VOTE_STREAM_URL`` pointing here.
+
+    python stream_gateway.py
+
+Uses only the standard library and ``redis.asyncio``.
+"""
+import asyncio
+import json
+import logging
+import os
+import signal
+import time
+from http.cookies import CookieError, SimpleCookie
+from urllib.parse import parse_qs, urlsplit
+from redis.asyncio import Redis
+from auth import AuthError, verify_jwt_token
+from live_updates import (CoalescingQueue, UpdateRouter, SSE_CLIENT_QUEUE_SIZE, SSE_HEARTBEAT_SECONDS,
+                          POLL_INTERVAL, RECONNECT_DELAY, parse_competition_ids, connected_frame,
+                          heartbeat_frame, data_frames)
+from redis_client import redis_host, redis_port
+
+GATEWAY_HOST = os.getenv('STREAM_GATEWAY_HOST', '0.0.0.0')
+GATEWAY_PORT = int(os.getenv('STREAM_GATEWAY_PORT', 8082))
+# Origins of the vote app pages allowed to open streams with their cookies
+ALLOWED_ORIGINS = {origin.strip().rstrip('/')
+                   for origin in os.getenv('STREAM_GATEWAY_ALLOWED_ORIGINS', '').split(',') if origin.strip()}
+CHANNEL = 'vote_updates'
+HEADER_TIMEOUT = 10
+WRITE_TIMEOUT = 30
+MAX_HEADER_LINES = 100
+STREAM_ROUTES = {
+    '/api/admin/vote-stream': True,
+    '/api/user/vote-stream': False,
+}
+
+logging.basicConfig(level=os.getenv('WORKER_LOG_LEVEL', 'info').upper(),
+                    format='%(asctime)s %(levelname)s %(message)s')
+logger = logging.getLogger('stream_gateway')
+
+
+class HttpError(Exception):
+    """Request rejected before the stream starts"""
+
+    def __init__(self, status, reason, message):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+
+
+class StreamClient(CoalescingQueue):
+    """Queue for one connection, awaited by its handler coroutine"""
+
+    def __init__(self, channels, maxsize=SSE_CLIENT_QUEUE_SIZE):
+        super().__init__(channels, maxsize)
+        self._ready = asyncio.Event()
+
+    def push(self, key, data):
+        self._enqueue(key, data)
+        self._ready.set()
+
+    async def get(self, timeout):
+        """Return all pending frames, or an empty list after ``timeout``"""
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        return self._drain()
+
+
+class StreamHub(UpdateRouter):
+    """The gateway's single Redis subscription, run as a task on the loop"""
+
+    subscription_class = StreamClient
+
+    async def _sync_channels(self, pubsub, subscribed):
+        wanted = self.wanted_channels()
+        added = wanted - subscribed
+        removed = subscribed - wanted
+        if added:
+            await pubsub.subscribe(*added)
+        if removed:
+            await pubsub.unsubscribe(*removed)
+        return wanted
+
+    async def run(self, redis):
+        """Read from Redis forever, reconnecting after failures"""
+        while True:
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                subscribed = set()
+                while True:
+                    subscribed = await self._sync_channels(pubsub, subscribed)
+                    if not subscribed:
+                        self.flush(force=True)
+                        await asyncio.sleep(POLL_INTERVAL)
+                        continue
+                    message = await pubsub.get_message(timeout=self.poll_timeout())
+                    if message and message['type'] == 'message':
+                        self.publish_local(message['channel'].decode('utf-8'), message['data'].decode('utf-8'))
+                    self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Subscriber for {self.channel} failed: {e}")
+                self.flush(force=True)
+            finally:
+                await pubsub.aclose()
+            self.count_reconnect()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+async def read_request(reader):
+    """Parse the request line and headers; returns (method, path, query, headers)"""
+    request_line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+    try:
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HttpError(400, 'Bad Request', 'Malformed request line')
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HttpError(431, 'Request Header Fields Too Large', 'Too many headers')
+    url = urlsplit(target)
+    return method, url.path, parse_qs(url.query), headers
+
+
+def request_token(headers):
+    """JWT from the auth_token cookie or a bearer Authorization header"""
+    if 'cookie' in headers:
+        try:
+            cookie = SimpleCookie(headers['cookie'])
+        except CookieError:
+            cookie = {}
+        if 'auth_token' in cookie and cookie['auth_token'].value:
+            return cookie['auth_token'].value
+    authorization = headers.get('authorization', '')
+    if authorization.startswith('Bearer '):
+        return authorization[7:]
+    return None
+
+
+def cors_headers(headers):
+    origin = headers.get('origin', '').rstrip('/')
+    if origin and origin in ALLOWED_ORIGINS:
+        return [f'Access-Control-Allow-Origin: {origin}', 'Access-Control-Allow-Credentials: true', 'Vary: Origin']
+    return []
+
+
+def response_head(status, reason, extra_headers):
+    lines = [f'HTTP/1.1 {status} {reason}', *extra_headers, 'Connection: close', '', '']
+    return '\r\n'.join(lines).encode('latin-1')
+
+
+async def write(writer, data):
+    writer.write(data.encode('utf-8') if isinstance(data, str) else data)
+    await asyncio.wait_for(writer.drain(), WRITE_TIMEOUT)
+
+
+async def send_json(writer, status, reason, payload, headers=()):
+    body = json.dumps(payload).encode('utf-8')
+    head = response_head(status, reason, ['Content-Type: application/json',
+                                          f'Content-Length: {len(body)}', *headers])
+    await write(writer, head + body)
+
+
+def authorize(path, headers):
+    """Return the token payload for a stream request or raise HttpError"""
+    token = request_token(headers)
+    if not token:
+        raise HttpError(401, 'Unauthorized', 'Unauthorized')
+    try:
+        payload = verify_jwt_token(token)
+    except AuthError:
+        raise HttpError(401, 'Unauthorized', 'Unauthorized')
+    if STREAM_ROUTES[path] and not payload.get('is_admin'):
+        raise HttpError(403, 'Forbidden', 'Admin access required')
+    return payload
+
+
+async def stream(hub, reader, writer, competition_ids, expires_at, headers):
+    """Send the SSE stream until the client leaves or its token expires"""
+    client = hub.subscribe(competition_ids)
+    # Clients send nothing after the request, so a read returning b'' means
+    # the connection was closed
+    disconnected = asyncio.ensure_future(reader.read(1024))
+    getter = None
+    try:
+        await write(writer, response_head(200, 'OK', [
+            'Content-Type: text/event-stream',
+            'Cache-Control: no-cache',
+            'X-Accel-Buffering: no',
+            *cors_headers(headers),
+        ]))
+        await write(writer, connected_frame(competition_ids))
+        while expires_at is None or time.time() < expires_at:
+            getter = asyncio.ensure_future(client.get(SSE_HEARTBEAT_SECONDS))
+            done, _ = await asyncio.wait({getter, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                messages = getter.result()
+                await write(writer, data_frames(messages) if messages else heartbeat_frame())
+            else:
+                getter.cancel()
+            if disconnected in done:
+                if not disconnected.result():
+                    break
+                disconnected = asyncio.ensure_future(reader.read(1024))
+    finally:
+        disconnected.cancel()
+        if getter is not None:
+            getter.cancel()
+        hub.unsubscribe(client)
+
+
+async def handle_connection(hub, reader, writer):
+    headers = {}
+    try:
+        method, path, query, headers = await read_request(reader)
+        if path == '/health':
+            await send_json(writer, 200, 'OK', {'status': 'ok', 'streams': hub.stats()})
+            return
+        if path not in STREAM_ROUTES:
+            raise HttpError(404, 'Not Found', 'Not found')
+        if method != 'GET':
+            raise HttpError(405, 'Method Not Allowed', 'Method not allowed')
+        payload = authorize(path, headers)
+        try:
+            competition_ids = parse_competition_ids(query.get('competition_id', []))
+        except ValueError as e:
+            raise HttpError(400, 'Bad Request', str(e))
+        await stream(hub, reader, writer, competition_ids, payload.get('exp'), headers)
+    except HttpError as e:
+        try:
+            await send_json(writer, e.status, e.reason, {'error': str(e)}, cors_headers(headers))
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+    except (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+        pass
+    except Exception as e:
+        logger.error(f"Stream connection error: {e}")
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+async def main():
+    hub = StreamHub(CHANNEL)
+    redis = Redis(host=redis_host, port=redis_port, db=0, health_check_interval=30)
+    subscriber = asyncio.ensure_future(hub.run(redis))
+    server = await asyncio.start_server(lambda r, w: handle_connection(hub, r, w),
+                                        GATEWAY_HOST, GATEWAY_PORT, backlog=4096)
+    logger.info(f"Stream gateway listening on {GATEWAY_HOST}:{GATEWAY_PORT}")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+    await stopping.wait()
+
+    server.close()
+    subscriber.cancel()
+    await redis.aclose()
+    logger.info(f"Stream gateway stopped: {hub.stats()}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
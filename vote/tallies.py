@@ -0,0 +1,103 @@
+"""Batched vote tallies and per-user overlays for competition listings"""
+import logging
+from redis.exceptions import RedisError
+import user_overlay
+
+logger = logging.getLogger(__name__)
+
+
+def load_vote_counts(cursor, competition_ids):
+    """Return {competition_id: {'a': n, 'b': n}} for all ids in one query"""
+    counts = {comp_id: {'a': 0, 'b': 0} for comp_id in competition_ids}
+    if not counts:
+        return counts
+
+    # competition_vote_counts is maintained by trigger (migrations/add_vote_counts.sql)
+    cursor.execute("""
+        SELECT competition_id, votes_a, votes_b
+        FROM competition_vote_counts
+        WHERE competition_id = ANY(%s)
+    """, (list(counts),))
+    for row in cursor.fetchall():
+        counts[row['competition_id']] = {'a': row['votes_a'], 'b': row['votes_b']}
+    return counts
+
+
+def load_user_overlay(cursor, user_id, competition_ids, include_votes=True, redis=None):
+    """Return (favorited_ids, {competition_id: vote}) for one user.
+
+    With ``redis`` the Redis overlay is read in one round trip and warmed
+    from Postgres on a miss; Postgres is queried directly without it or when
+    Redis fails.
+    """
+    ids = list(competition_ids)
+    if not ids:
+        return set(), {}
+
+    if redis is not None:
+        try:
+            overlay = user_overlay.read(redis, user_id, ids)
+            if overlay is None:
+                favorited, voted = user_overlay.warm(redis, cursor, user_id)
+                overlay = (favorited & set(ids), {cid: voted[cid] for cid in ids if cid in voted})
+            favorited, voted = overlay
+            return favorited, (voted if include_votes else {})
+        except RedisError as e:
+            logger.warning(f"User overlay unavailable, reading Postgres: {e}")
+
+    cursor.execute("""
+        SELECT competition_id FROM user_favorites
+        WHERE user_id = %s AND competition_id = ANY(%s)
+    """, (user_id, ids))
+    favorited = {row['competition_id'] for row in cursor.fetchall()}
+
+    if not include_votes:
+        return favorited, {}
+
+    cursor.execute("""
+        SELECT DISTINCT ON (competition_id) competition_id, vote
+        FROM votes
+        WHERE user_id = %s AND competition_id = ANY(%s)
+        ORDER BY competition_id, created_at DESC
+    """, (user_id, ids))
+    user_votes = {row['competition_id']: row['vote'] for row in cursor.fetchall()}
+
+    return favorited, user_votes
+
+
+def attach_tallies(cursor, comps, user_id=None, percentages=False, user_votes=False, redis=None):
+    """Decorate competition rows with vote counts and the user's overlay.
+
+    ``cursor`` must be a RealDictCursor. Every row gains ``votes_a``,
+    ``votes_b`` and ``total_votes``; ``percentage_a``/``percentage_b`` when
+    ``percentages`` is set; ``is_favorited`` when a ``user_id`` is given and
+    additionally ``user_vote`` when ``user_votes`` is set. ``redis`` is
+    passed on to :func:`load_user_overlay`.
+    """
+    ids = [comp['id'] for comp in comps]
+    counts = load_vote_counts(cursor, ids)
+
+    favorited, voted = set(), {}
+    if user_id is not None:
+        favorited, voted = load_user_overlay(cursor, user_id, ids, include_votes=user_votes, redis=redis)
+
+    for comp in comps:
+        tally = counts[comp['id']]
+        comp['votes_a'] = tally['a']
+        comp['votes_b'] = tally['b']
+        comp['total_votes'] = comp['votes_a'] + comp['votes_b']
+
+        if percentages:
+            if comp['total_votes'] > 0:
+                comp['percentage_a'] = round((comp['votes_a'] / comp['total_votes']) * 100, 1)
+                comp['percentage_b'] = round((comp['votes_b'] / comp['total_votes']) * 100, 1)
+            else:
+                comp['percentage_a'] = 0
+                comp['percentage_b'] = 0
+
+        if user_id is not None:
+            comp['is_favorited'] = comp['id'] in favorited
+            if user_votes:
+                comp['user_vote'] = voted.get(comp['id'])
+
+    return comps
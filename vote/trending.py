@@ -0,0 +1,179 @@
+"""Sliding-window trending engine backed by Redis.
+
+A voter's first vote in a competition increments a per-minute bucket
+(``trending:bucket:<minute>``) and the running 24h window
+(``trending:window``); repeated or changed votes do not, matching the one
+``votes`` row per voter that ``rebuild`` counts. The scoreboard's record
+script does the increments, since it already knows whether the voter voted
+before. Reads first roll the window
+forward by subtracting buckets that have fallen out of it, then serve the
+top-N straight from the sorted set. The window is rebuilt from Postgres when
+it is missing or too far behind.
+
+``competitions.trending_score`` backs ``sort=trending`` listings and the
+fallback when Redis is down. It is copied from the window by ``rebuild`` and,
+at most every ``TRENDING_PERSIST_SECONDS`` across all workers, by
+``ensure_fresh``.
+"""
+import os
+import time
+from redis_scripts import PipelineScript
+
+TRENDING_WINDOW_MINUTES = int(os.getenv('TRENDING_WINDOW_MINUTES', 1440))
+TRENDING_PERSIST_SECONDS = int(os.getenv('TRENDING_PERSIST_SECONDS', 60))
+REBUILD_LOCK_SECONDS = 60
+
+WINDOW_KEY = 'trending:window'
+HORIZON_KEY = 'trending:horizon'
+BUCKET_PREFIX = 'trending:bucket:'
+REBUILD_LOCK_KEY = 'trending:rebuild-lock'
+# Held (never released) for TRENDING_PERSIST_SECONDS after each persist
+PERSIST_LOCK_KEY = 'trending:persist-lock'
+
+# Buckets outlive the window slightly so a late roll can still subtract them
+BUCKET_TTL = TRENDING_WINDOW_MINUTES * 60 + 3600
+
+# Returns -1 when the window was never built or has fallen so far behind that
+# the buckets it needs to subtract may already have expired.
+_ROLL_LUA = """
+local cutoff = tonumber(ARGV[1]) - tonumber(ARGV[2])
+local horizon = redis.call('GET', KEYS[2])
+if not horizon then
+    return -1
+end
+horizon = tonumber(horizon)
+if cutoff - horizon > tonumber(ARGV[2]) then
+    return -1
+end
+local rolled = 0
+for minute = horizon + 1, cutoff do
+    local bucket = ARGV[3] .. minute
+    if redis.call('EXISTS', bucket) == 1 then
+        redis.call('ZUNIONSTORE', KEYS[1], 2, KEYS[1], bucket, 'WEIGHTS', 1, -1)
+        redis.call('DEL', bucket)
+        rolled = rolled + 1
+    end
+end
+if rolled > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', 0)
+end
+if cutoff > horizon then
+    redis.call('SET', KEYS[2], cutoff)
+end
+return rolled
+"""
+
+_roll_script = PipelineScript(_ROLL_LUA)
+
+
+def _current_minute(now=None):
+    return int((now if now is not None else time.time()) // 60)
+
+
+def vote_keys(now=None):
+    """The keys a first vote increments: the current minute bucket (which
+    expires after ``BUCKET_TTL``) and the window"""
+    return [f'{BUCKET_PREFIX}{_current_minute(now)}', WINDOW_KEY]
+
+
+def roll(redis, now=None):
+    """Expire buckets older than the window; returns -1 if a rebuild is needed"""
+    return _roll_script(redis, [WINDOW_KEY, HORIZON_KEY],
+                        [_current_minute(now), TRENDING_WINDOW_MINUTES, BUCKET_PREFIX])
+
+
+def persist_scores(redis, db):
+    """Copy the window's scores to competitions.trending_score, zeroing
+    competitions that dropped out of it"""
+    window = redis.zrange(WINDOW_KEY, 0, -1, withscores=True)
+    ids = [int(member) for member, _ in window]
+    scores = [int(score) for _, score in window]
+    cursor = db.cursor()
+    try:
+        cursor.execute("""
+            UPDATE competitions AS c
+            SET trending_score = v.score
+            FROM unnest(%s::int[], %s::int[]) AS v(id, score)
+            WHERE c.id = v.id AND c.trending_score IS DISTINCT FROM v.score
+        """, (ids, scores))
+        cursor.execute("""
+            UPDATE competitions
+            SET trending_score = 0
+            WHERE trending_score > 0 AND NOT (id = ANY(%s::int[]))
+        """, (ids,))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(ids)
+
+
+def rebuild(redis, db, now=None):
+    """Rebuild the window from Postgres and persist competitions.trending_score.
+
+    Assumes votes.created_at is stored in UTC, as with the default Postgres
+    container configuration.
+    """
+    cursor = db.cursor()
+    cursor.execute("""
+        SELECT competition_id,
+               FLOOR(EXTRACT(EPOCH FROM created_at) / 60)::BIGINT AS minute,
+               COUNT(*)
+        FROM votes
+        WHERE created_at > NOW() - make_interval(mins => %s)
+          AND competition_id IS NOT NULL
+        GROUP BY competition_id, minute
+    """, (TRENDING_WINDOW_MINUTES,))
+    rows = cursor.fetchall()
+    db.commit()
+    cursor.close()
+
+    cutoff = _current_minute(now) - TRENDING_WINDOW_MINUTES
+    buckets = {}
+    window = {}
+    for competition_id, minute, count in rows:
+        if minute <= cutoff:
+            continue
+        buckets.setdefault(minute, {})[competition_id] = count
+        window[competition_id] = window.get(competition_id, 0) + count
+
+    stale = list(redis.scan_iter(match=f'{BUCKET_PREFIX}*', count=1000))
+    pipe = redis.pipeline(transaction=True)
+    if stale:
+        pipe.delete(*stale)
+    pipe.delete(WINDOW_KEY)
+    for minute, counts in buckets.items():
+        pipe.zadd(f'{BUCKET_PREFIX}{minute}', counts)
+        pipe.expire(f'{BUCKET_PREFIX}{minute}', BUCKET_TTL)
+    if window:
+        pipe.zadd(WINDOW_KEY, window)
+    pipe.set(HORIZON_KEY, cutoff)
+    pipe.execute()
+    persist_scores(redis, db)
+    return len(window)
+
+
+def ensure_fresh(redis, db, now=None):
+    """Roll the window forward, rebuilding it (under a lock) when required,
+    and persist the scores when they are due"""
+    if roll(redis, now) != -1:
+        if redis.set(PERSIST_LOCK_KEY, os.getpid(), nx=True, ex=TRENDING_PERSIST_SECONDS):
+            persist_scores(redis, db)
+        return True
+    if not redis.set(REBUILD_LOCK_KEY, os.getpid(), nx=True, ex=REBUILD_LOCK_SECONDS):
+        # Another worker is rebuilding; serve whatever is there meanwhile
+        return False
+    try:
+        rebuild(redis, db, now)
+        redis.set(PERSIST_LOCK_KEY, os.getpid(), ex=TRENDING_PERSIST_SECONDS)
+    finally:
+        redis.delete(REBUILD_LOCK_KEY)
+    return True
+
+
+def top_competition_ids(redis, limit):
+    """Return [(competition_id, score)] ordered by score, highest first"""
+    return [(int(member), int(score))
+            for member, score in redis.zrevrange(WINDOW_KEY, 0, limit - 1, withscores=True)]
@@ -0,0 +1,117 @@
+"""Redis-resident per-user overlay: favorited competitions and own votes.
+
+Each user has a set of favorited competition ids (``user:<id>:favorites``),
+a hash of competition id to their choice (``user:<id>:votes``) and a marker
+(``user:<id>:overlay``) saying both are complete; an empty set or hash cannot
+exist in Redis, so the marker is what distinguishes "no favorites" from "not
+loaded". Overlays are warmed at login or on a miss and expire after
+``USER_OVERLAY_TTL`` seconds, which bounds drift against Postgres. Writes only
+touch warm overlays.
+"""
+import os
+from redis_scripts import PipelineScript
+
+USER_OVERLAY_TTL = int(os.getenv('USER_OVERLAY_TTL', 86400))
+
+_READ_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+return {redis.call('SMISMEMBER', KEYS[2], unpack(ARGV)), redis.call('HMGET', KEYS[3], unpack(ARGV))}
+"""
+
+_SET_FAVORITE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+if ARGV[2] == '1' then
+    redis.call('SADD', KEYS[2], ARGV[1])
+    -- The set may have just been created; expire it with the marker
+    redis.call('EXPIRE', KEYS[2], math.max(redis.call('TTL', KEYS[1]), 1))
+else
+    redis.call('SREM', KEYS[2], ARGV[1])
+end
+return 1
+"""
+
+_SET_VOTE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], math.max(redis.call('TTL', KEYS[1]), 1))
+return 1
+"""
+
+_read_script = PipelineScript(_READ_LUA)
+_set_favorite_script = PipelineScript(_SET_FAVORITE_LUA)
+_set_vote_script = PipelineScript(_SET_VOTE_LUA)
+
+
+def _run(redis, script, keys, args, pipe=None):
+    # Queued on ``pipe`` when given (run it with redis_scripts.execute)
+    if pipe is not None:
+        script.queue(redis, pipe, keys, args)
+    else:
+        script(redis, keys, args)
+
+
+def _keys(user_id):
+    return [f'user:{user_id}:overlay', f'user:{user_id}:favorites', f'user:{user_id}:votes']
+
+
+def read(redis, user_id, competition_ids):
+    """Return (favorited_ids, {competition_id: vote}) for ``competition_ids``
+    in one round trip, or None when the overlay is not warm"""
+    ids = list(competition_ids)
+    if not ids:
+        return set(), {}
+    result = _read_script(redis, _keys(user_id), ids)
+    if result is None:
+        return None
+    flags, votes = result
+    favorited = {comp_id for comp_id, flag in zip(ids, flags) if flag}
+    voted = {comp_id: vote.decode() for comp_id, vote in zip(ids, votes) if vote is not None}
+    return favorited, voted
+
+
+def warm(redis, cursor, user_id):
+    """Load the user's whole overlay from Postgres into Redis and return it
+    as (favorited_ids, {competition_id: vote}).
+
+    ``cursor`` must be a RealDictCursor.
+    """
+    cursor.execute("SELECT competition_id FROM user_favorites WHERE user_id = %s", (user_id,))
+    favorited = {row['competition_id'] for row in cursor.fetchall()}
+    cursor.execute("""
+        SELECT DISTINCT ON (competition_id) competition_id, vote
+        FROM votes
+        WHERE user_id = %s AND competition_id IS NOT NULL
+        ORDER BY competition_id, created_at DESC
+    """, (user_id,))
+    voted = {row['competition_id']: row['vote'] for row in cursor.fetchall()}
+
+    marker, favorites_key, votes_key = _keys(user_id)
+    pipe = redis.pipeline(transaction=True)
+    pipe.delete(marker, favorites_key, votes_key)
+    if favorited:
+        pipe.sadd(favorites_key, *favorited)
+        pipe.expire(favorites_key, USER_OVERLAY_TTL)
+    if voted:
+        pipe.hset(votes_key, mapping=voted)
+        pipe.expire(votes_key, USER_OVERLAY_TTL)
+    pipe.set(marker, 1, ex=USER_OVERLAY_TTL)
+    pipe.execute()
+    return favorited, voted
+
+
+def set_favorite(redis, user_id, competition_id, favorited, pipe=None):
+    """Record a favorite toggle if the overlay is warm"""
+    _run(redis, _set_favorite_script, _keys(user_id)[:2],
+         [competition_id, '1' if favorited else '0'], pipe)
+
+
+def set_vote(redis, user_id, competition_id, choice, pipe=None):
+    """Record the user's choice if the overlay is warm"""
+    marker, _, votes_key = _keys(user_id)
+    _run(redis, _set_vote_script, [marker, votes_key], [competition_id, choice], pipe)
@@ -0,0 +1,173 @@
+"""Write-behind buffer for competition view counts.
+
+A page view is a single HINCRBY on ``views:pending`` instead of an UPDATE and
+commit on the competition row. A background thread in every worker process
+flushes the buffer every ``VIEW_FLUSH_INTERVAL`` seconds: under a Redis lock
+the pending hash is renamed to ``views:flushing`` (so new views keep landing
+in a fresh hash) and applied to Postgres as one batched UPDATE.
+
+Each renamed batch gets an id (``views:flushing-batch``) that is recorded
+in ``view_count_flushes`` (migrations/add_view_count_flushes.sql) in the same
+transaction as the UPDATE. Postgres lags by at most one flush interval. A
+batch left behind by a failed flush is retried by the next one, and skipped
+there if its id shows it was already committed. Views are only lost if Redis
+loses the pending hash itself.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from psycopg2.extras import execute_values
+from redis_scripts import PipelineScript
+
+VIEW_FLUSH_INTERVAL = float(os.getenv('VIEW_FLUSH_INTERVAL', 5))
+FLUSH_LOCK_SECONDS = 60
+
+PENDING_KEY = 'views:pending'
+FLUSHING_KEY = 'views:flushing'
+FLUSH_BATCH_KEY = 'views:flushing-batch'
+FLUSH_LOCK_KEY = 'views:flush-lock'
+# Applied batch ids are kept this long, far beyond any retry
+FLUSH_LOG_RETENTION = '1 day'
+
+# Returns the id of the batch to flush: one left behind by a failed flush, or
+# the pending hash renamed under the new id ARGV[1]; false when there is none
+_CLAIM_LUA = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    local batch = redis.call('GET', KEYS[3])
+    if not batch then
+        batch = ARGV[1]
+        redis.call('SET', KEYS[3], batch)
+    end
+    return batch
+end
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+redis.call('RENAME', KEYS[1], KEYS[2])
+redis.call('SET', KEYS[3], ARGV[1])
+return ARGV[1]
+"""
+_claim_script = PipelineScript(_CLAIM_LUA)
+
+# Deletes the lock only while it still holds this flush's token
+_UNLOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_unlock_script = PipelineScript(_UNLOCK_LUA)
+
+FLUSH_SQL = """
+    UPDATE competitions AS c
+    SET view_count = c.view_count + v.views
+    FROM (VALUES %s) AS v(id, views)
+    WHERE c.id = v.id
+"""
+
+RECORD_BATCH_SQL = "INSERT INTO view_count_flushes (batch_id) VALUES (%s) ON CONFLICT DO NOTHING"
+PRUNE_BATCHES_SQL = f"DELETE FROM view_count_flushes WHERE flushed_at < NOW() - INTERVAL '{FLUSH_LOG_RETENTION}'"
+
+logger = logging.getLogger(__name__)
+
+
+def record_view(redis, competition_id):
+    """Buffer one view of ``competition_id``"""
+    redis.hincrby(PENDING_KEY, competition_id, 1)
+
+
+def flush(redis, conn):
+    """Apply buffered views to Postgres in one statement.
+
+    Returns the number of competitions updated, or None when another process
+    is flushing.
+    """
+    token = uuid.uuid4().hex
+    if not redis.set(FLUSH_LOCK_KEY, token, nx=True, ex=FLUSH_LOCK_SECONDS):
+        return None
+    try:
+        batch_id = _claim_script(redis, [PENDING_KEY, FLUSHING_KEY, FLUSH_BATCH_KEY], [uuid.uuid4().hex])
+        if batch_id is None:
+            # No views since the last flush
+            return 0
+        rows = sorted((int(comp_id), int(views))
+                      for comp_id, views in redis.hgetall(FLUSHING_KEY).items() if int(views) > 0)
+        if rows:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(RECORD_BATCH_SQL, (batch_id.decode(),))
+                if cursor.rowcount:
+                    execute_values(cursor, FLUSH_SQL, rows, template='(%s::int, %s::int)', page_size=len(rows))
+                else:
+                    logger.warning(f"View count batch {batch_id.decode()} was already applied; discarding it")
+                    rows = []
+                cursor.execute(PRUNE_BATCHES_SQL)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        redis.delete(FLUSHING_KEY, FLUSH_BATCH_KEY)
+        return len(rows)
+    finally:
+        _unlock_script(redis, [FLUSH_LOCK_KEY], [token])
+
+
+class ViewFlusher:
+    """Per-process background thread that periodically flushes the buffer"""
+
+    def __init__(self, get_redis, pool, interval=VIEW_FLUSH_INTERVAL):
+        self.get_redis = get_redis
+        self.pool = pool
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stats = {'flushes': 0, 'competitions': 0, 'failures': 0, 'last_flush_ms': 0.0}
+
+    def ensure_running(self):
+        """Start the flusher thread for this process if it is not running"""
+        with self._lock:
+            # Threads do not survive a fork, so start one per worker process
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='view-flusher', daemon=True)
+                self._thread.start()
+
+    def flush_once(self):
+        started = time.monotonic()
+        redis = self.get_redis()
+        # Only take a pool connection when there is something to write
+        if redis.exists(PENDING_KEY, FLUSHING_KEY):
+            conn = self.pool.getconn()
+            try:
+                updated = flush(redis, conn)
+            finally:
+                self.pool.putconn(conn)
+        else:
+            updated = 0
+        if updated is not None:
+            with self._lock:
+                self._stats['flushes'] += 1
+                self._stats['competitions'] += updated
+                self._stats['last_flush_ms'] = round((time.monotonic() - started) * 1000, 2)
+        return updated
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush_once()
+            except Exception as e:
+                with self._lock:
+                    self._stats['failures'] += 1
+                logger.error(f"View count flush failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot['interval'] = self.interval
+        return snapshot
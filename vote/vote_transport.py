@@ -0,0 +1,230 @@
+"""Vote queue transport between the web app and the ingestion workers.
+
+``VOTE_TRANSPORT=list`` (the default) pushes onto the ``votes`` list that the
+.NET worker and ``ingest_worker.py`` pop from; a popped vote is gone, so a
+crash mid-batch loses it. ``VOTE_TRANSPORT=stream`` appends to a Redis Stream
+read through a consumer group instead: entries stay pending until the batch is
+committed and acknowledged, entries left pending by a dead consumer are
+reclaimed with XAUTOCLAIM, and any number of ingesters can share the load.
+An entry delivered more than ``VOTE_STREAM_MAX_DELIVERIES`` times is moved to
+the ``<stream>:dead-letter`` stream and acknowledged, so a batch that keeps
+failing cannot wedge every consumer in turn.
+Stream mode is only consumed by ``ingest_worker.py``.
+"""
+import logging
+import os
+import socket
+import time
+from redis.exceptions import ResponseError
+
+VOTE_TRANSPORT = os.getenv('VOTE_TRANSPORT', 'list')
+LIST_KEY = 'votes'
+STREAM_KEY = os.getenv('VOTE_STREAM_KEY', 'votes:stream')
+STREAM_GROUP = os.getenv('VOTE_STREAM_GROUP', 'vote-ingest')
+# Hard cap applied on XADD; consumers also trim everything already acknowledged
+STREAM_MAXLEN = int(os.getenv('VOTE_STREAM_MAXLEN', 1000000))
+CLAIM_IDLE_MS = int(os.getenv('VOTE_STREAM_CLAIM_IDLE_MS', 30000))
+MAX_DELIVERIES = int(os.getenv('VOTE_STREAM_MAX_DELIVERIES', 10))
+DEAD_LETTER_STREAM = f'{STREAM_KEY}:dead-letter'
+DEAD_LETTER_MAXLEN = 10000
+TRIM_INTERVAL = 5
+
+logger = logging.getLogger(__name__)
+
+if VOTE_TRANSPORT not in ('list', 'stream'):
+    raise ValueError(f"VOTE_TRANSPORT must be 'list' or 'stream', not {VOTE_TRANSPORT!r}")
+
+
+def enqueue(pipe, data):
+    """Queue one serialized vote on ``pipe`` (a single command either way)"""
+    if VOTE_TRANSPORT == 'stream':
+        pipe.xadd(STREAM_KEY, {'vote': data}, maxlen=STREAM_MAXLEN, approximate=True)
+    else:
+        pipe.rpush(LIST_KEY, data)
+
+
+def get_consumer(redis, name=None):
+    """Return the consumer for the configured transport"""
+    if VOTE_TRANSPORT == 'stream':
+        return StreamConsumer(redis, name)
+    return ListConsumer(redis)
+
+
+class ListConsumer:
+    """Pops votes off the list; acknowledgement is implicit in the pop"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self._batch = []
+
+    def read_batch(self, batch_size, flush_interval):
+        """Collect up to ``batch_size`` raw votes, waiting at most
+        ``flush_interval`` seconds after the first one arrives"""
+        self._batch = []
+        first = self.redis.blpop(LIST_KEY, timeout=max(flush_interval, 1))
+        if not first:
+            return []
+        items = [first[1]]
+        deadline = time.monotonic() + flush_interval
+        while len(items) < batch_size:
+            more = self.redis.lpop(LIST_KEY, batch_size - len(items))
+            if more:
+                items.extend(more)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # BLPOP timeouts have 10ms resolution on Redis >= 6
+            item = self.redis.blpop(LIST_KEY, timeout=max(remaining, 0.01))
+            if not item:
+                break
+            items.append(item[1])
+        self._batch = items
+        return items
+
+    def ack(self):
+        self._batch = []
+
+    def retry(self):
+        """Put the unwritten batch back at the head of the list in order"""
+        if self._batch:
+            self.redis.lpush(LIST_KEY, *reversed(self._batch))
+        self._batch = []
+
+
+class StreamConsumer:
+    """Reads votes through a consumer group, acknowledging committed batches"""
+
+    def __init__(self, redis, name=None):
+        self.redis = redis
+        self.name = name or f'{socket.gethostname()}-{os.getpid()}'
+        self._ids = []
+        # Start from our own pending entries (left by a previous run under the
+        # same name or by a failed batch) before reading new ones
+        self._pending = True
+        self._claim_cursor = '0-0'
+        self._trimmed_at = 0.0
+        self.ensure_group()
+
+    def ensure_group(self):
+        try:
+            self.redis.xgroup_create(STREAM_KEY, STREAM_GROUP, id='0', mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def _read(self, stream_id, count, block_ms=None):
+        response = self.redis.xreadgroup(STREAM_GROUP, self.name, {STREAM_KEY: stream_id},
+                                         count=count, block=block_ms)
+        if not response:
+            return []
+        # RESP2 returns [[stream, entries]], RESP3 {stream: [entries]}
+        entries = response[0][1] if isinstance(response, list) else next(iter(response.values()))[0]
+        return entries
+
+    def _reclaim(self, count):
+        """Take over entries another consumer left idle for CLAIM_IDLE_MS"""
+        next_cursor, entries = self.redis.xautoclaim(
+            STREAM_KEY, STREAM_GROUP, self.name, CLAIM_IDLE_MS,
+            start_id=self._claim_cursor, count=count)[:2]
+        self._claim_cursor = next_cursor
+        return entries
+
+    def _drop_overdelivered(self, entries):
+        """Dead-letter and acknowledge redelivered entries past MAX_DELIVERIES;
+        returns the others"""
+        if not entries or MAX_DELIVERIES <= 0:
+            return entries
+        deliveries = {}
+        for pending in self.redis.xpending_range(STREAM_KEY, STREAM_GROUP, min=entries[0][0],
+                                                 max=entries[-1][0], count=len(entries),
+                                                 consumername=self.name):
+            deliveries[pending['message_id']] = pending['times_delivered']
+        dead = [(entry_id, fields) for entry_id, fields in entries
+                if deliveries.get(entry_id, 0) > MAX_DELIVERIES]
+        if not dead:
+            return entries
+        pipe = self.redis.pipeline(transaction=True)
+        for entry_id, fields in dead:
+            # Entries trimmed while pending have no fields left to keep
+            if fields:
+                pipe.xadd(DEAD_LETTER_STREAM, {**fields, 'source_id': entry_id,
+                                               'deliveries': deliveries[entry_id]},
+                          maxlen=DEAD_LETTER_MAXLEN, approximate=True)
+        pipe.xack(STREAM_KEY, STREAM_GROUP, *[entry_id for entry_id, _ in dead])
+        pipe.execute()
+        logger.error("Moved %d vote entries delivered more than %d times to %s",
+                     len(dead), MAX_DELIVERIES, DEAD_LETTER_STREAM)
+        dead_ids = {entry_id for entry_id, _ in dead}
+        return [entry for entry in entries if entry[0] not in dead_ids]
+
+    def read_batch(self, batch_size, flush_interval):
+        """Collect up to ``batch_size`` raw votes: own pending entries first,
+        then reclaimed ones, then new ones"""
+        self._ids = []
+        entries = []
+        if self._pending:
+            entries = self._read('0', batch_size)
+            if not entries:
+                self._pending = False
+            entries = self._drop_overdelivered(entries)
+        if not entries and not self._pending:
+            entries = self._drop_overdelivered(self._reclaim(batch_size))
+        if not entries:
+            entries = self._read('>', batch_size, block_ms=int(max(flush_interval, 1) * 1000))
+            deadline = time.monotonic() + flush_interval
+            while entries and len(entries) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                more = self._read('>', batch_size - len(entries), block_ms=max(int(remaining * 1000), 1))
+                if not more:
+                    break
+                entries.extend(more)
+
+        items = []
+        for entry_id, fields in entries:
+            self._ids.append(entry_id)
+            # Entries trimmed while pending come back with no fields
+            if fields:
+                items.append(fields.get(b'vote', fields.get('vote')))
+        return items
+
+    def ack(self):
+        """Acknowledge the last batch and trim what the group has finished"""
+        if self._ids:
+            self.redis.xack(STREAM_KEY, STREAM_GROUP, *self._ids)
+        self._ids = []
+        self.trim()
+
+    def retry(self):
+        """Leave the last batch pending and re-read it on the next call"""
+        self._ids = []
+        self._pending = True
+
+    def trim(self):
+        """Drop entries the group has delivered and acknowledged, at most once
+        every TRIM_INTERVAL seconds"""
+        now = time.monotonic()
+        if now - self._trimmed_at < TRIM_INTERVAL:
+            return 0
+        self._trimmed_at = now
+        # Everything before the oldest pending entry is acknowledged; with
+        # nothing pending, everything up to the last delivered id is
+        floor = self.redis.xpending(STREAM_KEY, STREAM_GROUP)['min']
+        if floor is None:
+            for group in self.redis.xinfo_groups(STREAM_KEY):
+                name = group['name']
+                if (name.decode() if isinstance(name, bytes) else name) == STREAM_GROUP:
+                    floor = _next_id(group['last-delivered-id'])
+        if floor is None:
+            return 0
+        return self.redis.xtrim(STREAM_KEY, minid=floor, approximate=True)
+
+
+def _next_id(stream_id):
+    """The smallest stream id after ``stream_id``"""
+    if isinstance(stream_id, bytes):
+        stream_id = stream_id.decode()
+    ms, _, seq = stream_id.partition('-')
+    return f'{ms}-{int(seq or 0) + 1}'